@@ -1,15 +1,61 @@
+import os
+import click
 from flask import Flask
 # import config from app.config file
 from app.config import Config
 # import modeles from 
 from app.models import db
 
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "migrations")
+
+
+def init_migrations(app):
+    """Set up Flask-Migrate so flask_migrate.upgrade() etc. work on this app."""
+    from flask_migrate import Migrate
+
+    Migrate(app, db, directory=MIGRATIONS_DIR, render_as_batch=True)
+
+
+class MigrationsGroup(click.Group):
+    """Placeholder for Flask-Migrate's `db` group, loaded when a `flask db` command runs.
+
+    Importing Flask-Migrate pulls in all of Alembic, which web workers never need.
+    """
+
+    def __init__(self, app):
+        super().__init__("db", help="Database migrations (Flask-Migrate).")
+        self.app = app
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        from flask_migrate.cli import db as db_group
+
+        init_migrations(self.app)
+        return db_group.make_context(info_name, args, parent=parent, **extra)
+
+
 def create_app():
     app = Flask(__name__, template_folder="../templates", static_folder="../static")
     app.config.from_object(Config)
+    if app.config.get("TRUSTED_PROXIES"):
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"],
+                                x_proto=app.config["TRUSTED_PROXIES"])
 
-    # Initialize database
+    # Initialize database; the schema itself is managed by `flask db upgrade`
     db.init_app(app)
+    app.cli.add_command(MigrationsGroup(app))
+
+    from app import tasks, cache, images, assets, inventory, contacts, security, metrics, health, analytics
+    metrics.init_app(app)
+    health.init_app(app)
+    tasks.init_app(app)
+    inventory.init_app(app)
+    analytics.init_app(app)
+    contacts.init_app(app)
+    security.init_app(app)
+    cache.init_app(app)
+    images.init_app(app)
+    assets.init_app(app)
 
     from app.routes.main import main_bp
     from app.routes.booking import booking_bp
@@ -21,8 +67,21 @@ def create_app():
     app.register_blueprint(auth_bp)
     app.register_blueprint(misc_bp)
 
-    # Create tables inside app context 
-    with app.app_context():
-        db.create_all()
+    from app.catalog import get_plan
+    app.jinja_env.globals["get_plan"] = get_plan
 
     return app
+
+
+def reset_after_fork(app):
+    """Give a forked worker its own database connections and gateway client.
+
+    Called from gunicorn's post_fork hook when the app is preloaded in the master.
+    """
+    from app.razorpay_client import reset_razorpay_client
+
+    with app.app_context():
+        # Forget the master's pooled connections (primary and replica) without closing them under it
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    reset_razorpay_client()
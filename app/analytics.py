@@ -0,0 +1,225 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import date, datetime, time, timedelta
+
+import click
+from sqlalchemy import delete, func, text, update
+
+from app.inventory import availability_changed, reclaim
+from app.models import Booking, DailyRollup, db, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("bookings", "paid", "revenue", "active_members")
+# What a booking contributes to the rollups is computed from these columns
+ROLLUP_COLUMNS = (Booking.plan_id, Booking.created_at, Booking.paid, Booking.paid_at, Booking.amount,
+                  Booking.start_date, Booking.end_date)
+# Default dashboard window, in days
+ANALYTICS_DAYS = 30
+# A booking paid after its seats were given to someone else; an admin has to place it
+NEEDS_SEAT = "needs_seat"
+
+
+def _day(value):
+    # func.date() gives a string on SQLite and a date on PostgreSQL
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _add(deltas, row, sign, made=True):
+    """Add what one booking row contributes (times ``sign``) to ``deltas``."""
+    plan_id = row.plan_id or ""
+    created = row.created_at or datetime.utcnow()
+    if made:
+        deltas[(_day(created), plan_id)]["bookings"] += sign
+    if row.paid:
+        counts = deltas[(_day(row.paid_at or created), plan_id)]
+        counts["paid"] += sign
+        counts["revenue"] += sign * (row.amount or 0)
+        day, last = row.start_date, row.end_date or row.start_date
+        while day <= last:
+            deltas[(day, plan_id)]["active_members"] += sign
+            day += timedelta(days=1)
+
+
+def _upsert():
+    table = DailyRollup.__table__
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(index_elements=["date", "plan_id"],
+                                      set_={c: table.c[c] + stmt.excluded[c] for c in COUNTERS})
+
+
+def _apply(deltas):
+    """Add ``deltas`` to the rollup rows in one statement, in the caller's transaction.
+
+    Rows are written in key order so concurrent writers lock them in the
+    same order.
+    """
+    rows = [{"date": day, "plan_id": plan_id, **{c: counts[c] for c in COUNTERS}}
+            for (day, plan_id), counts in sorted(deltas.items()) if any(counts.values())]
+    if rows:
+        db.session.execute(_upsert(), rows)
+
+
+def record_booking(booking):
+    """Count a new booking, in the caller's transaction."""
+    deltas = defaultdict(Counter)
+    _add(deltas, booking, 1)
+    _apply(deltas)
+
+
+def mark_paid(*clauses):
+    """Mark the unpaid bookings matching ``clauses`` paid and add them to the rollups.
+
+    One UPDATE ... RETURNING, so a booking two consumers race to mark paid
+    is only counted by the one that actually changed it. A booking that had
+    given its seats back (expired, or a failed order marked paid by an
+    admin) takes them again; if they are gone it is marked NEEDS_SEAT and
+    logged for an admin. Runs in the caller's transaction; returns how many
+    bookings were marked.
+    """
+    rows = db.session.execute(update(Booking)
+                              .where(*clauses, Booking.paid.isnot(True))
+                              .values(paid=True, paid_at=datetime.utcnow())
+                              .returning(Booking.id, Booking.status, Booking.seat_held, *ROLLUP_COLUMNS)
+                              .execution_options(synchronize_session=False)).all()
+    deltas = defaultdict(Counter)
+    for row in rows:
+        _add(deltas, row, 1, made=False)
+    _apply(deltas)
+
+    # Legacy bookings without an end date never held seats
+    seatless = [row.id for row in rows if not row.seat_held and row.end_date is not None]
+    unseated = [booking_id for booking_id in seatless if not reclaim(booking_id)]
+    expired = [row.id for row in rows if row.status == "expired"]
+    if expired or unseated:
+        # Expired bookings are live again; any other status is kept unless the seats are gone
+        (Booking.query
+         .filter(Booking.id.in_(expired + unseated))
+         .update({"status": db.case((Booking.id.in_(unseated or [0]), NEEDS_SEAT), else_="created")},
+                 synchronize_session=False))
+    if unseated:
+        logger.error(f"Bookings {unseated} were paid without seats and theirs are taken")
+    if seatless:
+        availability_changed()
+    return len(rows)
+
+
+def delete_bookings(*clauses):
+    """Delete the bookings matching ``clauses`` and take them out of the rollups; returns how many."""
+    rows = db.session.execute(delete(Booking)
+                              .where(*clauses)
+                              .returning(*ROLLUP_COLUMNS)
+                              .execution_options(synchronize_session=False)).all()
+    deltas = defaultdict(Counter)
+    for row in rows:
+        _add(deltas, row, -1)
+    _apply(deltas)
+    return len(rows)
+
+
+def rebuild_rollups(start=None, end=None):
+    """Recompute the rollups from bookings, for every day or only ``start``..``end``.
+
+    Three GROUP BY queries over Booking (made, paid and active per plan)
+    replace the rows in one transaction. The table is locked while it runs on
+    PostgreSQL, so incremental updates from checkouts and payments wait and
+    then apply on top; run full rebuilds off-peak. Returns the rows written.
+    """
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(text("LOCK TABLE daily_rollup IN EXCLUSIVE MODE"))
+    in_range = []
+    if start is not None:
+        in_range.append(DailyRollup.date >= start)
+    if end is not None:
+        in_range.append(DailyRollup.date <= end)
+    db.session.execute(delete(DailyRollup).where(*in_range))
+
+    def between(column):
+        clauses = []
+        if start is not None:
+            clauses.append(column >= datetime.combine(start, time.min))
+        if end is not None:
+            clauses.append(column < datetime.combine(end + timedelta(days=1), time.min))
+        return clauses
+
+    plan_id = func.coalesce(Booking.plan_id, "")
+    deltas = defaultdict(Counter)
+    made_day = func.date(Booking.created_at)
+    for day, plan, count in (db.session.query(made_day, plan_id, func.count())
+                             .filter(*between(Booking.created_at))
+                             .group_by(made_day, plan_id)):
+        deltas[(_day(day), plan)]["bookings"] = count
+
+    paid_at = func.coalesce(Booking.paid_at, Booking.created_at)
+    paid_day = func.date(paid_at)
+    for day, plan, count, revenue in (db.session.query(paid_day, plan_id, func.count(),
+                                                       func.sum(func.coalesce(Booking.amount, 0)))
+                                      .filter(Booking.paid.is_(True), *between(paid_at))
+                                      .group_by(paid_day, plan_id)):
+        deltas[(_day(day), plan)].update(paid=count, revenue=revenue or 0)
+
+    # Active members: +n on the first day of each paid period and -n after its
+    # last, then a running sum per plan
+    last_day = func.coalesce(Booking.end_date, Booking.start_date)
+    covering = [Booking.paid.is_(True)]
+    if start is not None:
+        covering.append(last_day >= start)
+    if end is not None:
+        covering.append(Booking.start_date <= end)
+    changes = defaultdict(Counter)
+    for plan, first, last, count in (db.session.query(plan_id, Booking.start_date, last_day, func.count())
+                                     .filter(*covering)
+                                     .group_by(plan_id, Booking.start_date, last_day)):
+        first, last = _day(first), _day(last)
+        changes[plan][max(first, start) if start else first] += count
+        changes[plan][last + timedelta(days=1)] -= count
+    for plan, by_day in changes.items():
+        active, day, stop = 0, min(by_day), max(by_day)
+        if end is not None:
+            stop = min(stop, end + timedelta(days=1))
+        while day < stop:
+            active += by_day.get(day, 0)
+            if active:
+                deltas[(day, plan)]["active_members"] = active
+            day += timedelta(days=1)
+
+    _apply(deltas)
+    db.session.commit()
+    written = sum(1 for counts in deltas.values() if any(counts.values()))
+    logger.info(f"Rebuilt {written} rollup rows from {start or 'the start'} to {end or 'the end'}")
+    return written
+
+
+def analytics_summary(start, end):
+    """Dashboard figures for ``start``..``end``, read from the rollups only."""
+    days = [{"date": day, "bookings": bookings, "paid": paid, "revenue": revenue, "active_members": active}
+            for day, bookings, paid, revenue, active in
+            (db.session.query(DailyRollup.date, func.sum(DailyRollup.bookings), func.sum(DailyRollup.paid),
+                              func.sum(DailyRollup.revenue), func.sum(DailyRollup.active_members))
+             .filter(DailyRollup.date.between(start, end))
+             .group_by(DailyRollup.date)
+             .order_by(DailyRollup.date))]
+    active_on_end = dict(db.session.query(DailyRollup.plan_id, DailyRollup.active_members)
+                         .filter(DailyRollup.date == end))
+    plans = [{"plan_id": plan, "bookings": bookings, "paid": paid, "revenue": revenue,
+              "active_members": active_on_end.get(plan, 0)}
+             for plan, bookings, paid, revenue in
+             (db.session.query(DailyRollup.plan_id, func.sum(DailyRollup.bookings), func.sum(DailyRollup.paid),
+                               func.sum(DailyRollup.revenue))
+              .filter(DailyRollup.date.between(start, end))
+              .group_by(DailyRollup.plan_id)
+              .order_by(func.sum(DailyRollup.revenue).desc()))]
+    totals = {c: sum(p[c] for p in plans) for c in COUNTERS}
+    totals["conversion"] = totals["paid"] / totals["bookings"] if totals["bookings"] else None
+    return {"start": start, "end": end, "days": days, "plans": plans, "totals": totals}
+
+
+def init_app(app):
+    @app.cli.command("rebuild-rollups")
+    @click.option("--start", type=click.DateTime(["%Y-%m-%d"]), help="First day to rebuild (default: all)")
+    @click.option("--end", type=click.DateTime(["%Y-%m-%d"]), help="Last day to rebuild (default: all)")
+    def rebuild_rollups_command(start, end):
+        """Recompute the analytics rollups from bookings."""
+        print(f"Wrote {rebuild_rollups(start and start.date(), end and end.date())} rollup rows")
@@ -0,0 +1,182 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+
+from flask import Blueprint, abort, current_app, request, send_from_directory, url_for
+
+from app.images import MANIFEST_NAME as IMAGE_MANIFEST_NAME, VARIANT_DIR
+from app.images import load_manifest as load_image_manifest
+
+DIST_DIR = "dist"  # Relative to the static folder
+MANIFEST_NAME = "manifest.json"
+SOURCE_EXTENSIONS = (".css", ".js")
+COMPRESSIBLE = (".css", ".js", ".svg", ".json")
+ONE_YEAR = 365 * 24 * 3600
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)(/static/)?([^'")]+)\1\s*\)""")
+
+assets_bp = Blueprint("assets", __name__)
+
+_manifest_cache = {}
+_version_cache = {}
+
+
+def _hashed_name(path, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+def _write(output_root, relative, data):
+    target = os.path.join(output_root, relative)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+    if relative.endswith(COMPRESSIBLE):
+        with open(target + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            with open(target + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+
+
+def build_assets(static_folder):
+    """Copy CSS/JS into static/dist under content-hashed names.
+
+    url(...) references inside CSS are rewritten to hashed copies too (or to
+    the largest JPEG variant when the image pipeline has one), so every file
+    a page pulls in can be cached forever. Gzip, and Brotli when the
+    ``brotli`` package is installed, are written next to each text file.
+    """
+    output_root = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(output_root):
+        shutil.rmtree(output_root)
+    manifest = {}
+    images = load_image_manifest(static_folder)
+
+    def hash_file(relative):
+        if relative in manifest:
+            return manifest[relative]
+        variants = images.get(relative)
+        if variants:
+            manifest[relative] = variants["sources"]["image/jpeg"][-1][0]
+            return manifest[relative]
+        with open(os.path.join(static_folder, relative), "rb") as f:
+            data = f.read()
+        hashed = f"{DIST_DIR}/{_hashed_name(relative, data)}"
+        _write(static_folder, hashed, data)
+        manifest[relative] = hashed
+        return hashed
+
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != output_root]
+        for name in sorted(files):
+            if not name.endswith(SOURCE_EXTENSIONS):
+                continue
+            relative = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+            with open(os.path.join(static_folder, relative), "rb") as f:
+                data = f.read()
+
+            if name.endswith(".css"):
+                base = os.path.dirname(relative)
+
+                def rewrite(match):
+                    quote, absolute, target = match.groups()
+                    if target.startswith(("data:", "http:", "https:", "//")):
+                        return match.group(0)
+                    referenced = os.path.normpath(target if absolute else os.path.join(base, target))
+                    if not os.path.isfile(os.path.join(static_folder, referenced)):
+                        return match.group(0)
+                    return f"url({quote}/assets/{hash_file(referenced.replace(os.sep, '/'))}{quote})"
+
+                data = CSS_URL.sub(rewrite, data.decode("utf-8")).encode("utf-8")
+
+            hashed = f"{DIST_DIR}/{_hashed_name(relative, data)}"
+            _write(static_folder, hashed, data)
+            manifest[relative] = hashed
+
+    os.makedirs(output_root, exist_ok=True)
+    with open(os.path.join(output_root, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    _manifest_cache.clear()
+    _version_cache.clear()
+    return manifest
+
+
+def load_manifest(static_folder):
+    if static_folder not in _manifest_cache:
+        try:
+            with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        _manifest_cache[static_folder] = (manifest, set(manifest.values()))
+    return _manifest_cache[static_folder]
+
+
+def build_version(static_folder):
+    """Short hash of the asset and image manifests; changes with every build that renames files."""
+    if static_folder not in _version_cache:
+        manifest, _ = load_manifest(static_folder)
+        both = json.dumps([manifest, load_image_manifest(static_folder)], sort_keys=True)
+        _version_cache[static_folder] = hashlib.sha1(both.encode()).hexdigest()[:12]
+    return _version_cache[static_folder]
+
+
+def is_fingerprinted(path):
+    """True for files whose name changes whenever their content does."""
+    manifest, hashed = load_manifest(current_app.static_folder)
+    if path == f"{VARIANT_DIR}/{IMAGE_MANIFEST_NAME}":
+        return False  # Rewritten in place by every image build
+    return path in hashed or path.startswith(f"{VARIANT_DIR}/")
+
+
+def asset_url(filename):
+    """url_for('static', ...) replacement that prefers the fingerprinted copy."""
+    manifest, _ = load_manifest(current_app.static_folder)
+    hashed = manifest.get(filename)
+    if hashed is None and filename.startswith("img/variants/"):
+        hashed = filename  # Already content-hashed by the image pipeline
+    if hashed is None:
+        return url_for("static", filename=filename)
+    return url_for("assets.asset", filename=hashed)
+
+
+@assets_bp.route("/assets/<path:filename>")
+def asset(filename):
+    if not is_fingerprinted(filename):
+        abort(404)
+
+    static_folder = current_app.static_folder
+    accepted = request.accept_encodings
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if accepted[encoding] and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            response = send_from_directory(static_folder, filename + suffix, max_age=ONE_YEAR,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename, max_age=ONE_YEAR)
+
+    response.headers["Cache-Control"] = f"public, max-age={ONE_YEAR}, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_app(app):
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals["asset_url"] = asset_url
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Fingerprint and precompress CSS/JS into static/dist."""
+        manifest = build_assets(app.static_folder)
+        print(f"Fingerprinted {len(manifest)} assets")
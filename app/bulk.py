@@ -0,0 +1,48 @@
+import json
+import logging
+
+from app.analytics import delete_bookings, mark_paid
+from app.inventory import availability_changed, expire_bookings, release_bookings
+from app.models import AdminAudit, Booking, Contact, db
+
+logger = logging.getLogger(__name__)
+
+BULK_ACTIONS = {
+    "booking": ("delete", "mark_paid", "expire"),
+    "contact": ("delete",),
+}
+# Largest explicit selection accepted in one request
+BULK_MAX_IDS = 1000
+
+
+def bulk_apply(record_type, action, clauses, criteria, user_email=None):
+    """Apply an admin action to every row matching ``clauses`` and audit it.
+
+    Each action is one set-based statement (plus two more that give back
+    the seats of bookings still holding them), committed together with its
+    AdminAudit row.
+    ``criteria`` is what the admin selected, ids or filters, as stored in the
+    audit log. Returns the number of rows affected.
+    """
+    model = Booking if record_type == "booking" else Contact
+    released = False
+
+    if action == "expire":
+        affected = expire_bookings(db.select(Booking.id).where(*clauses))
+        released = bool(affected)
+    elif record_type == "booking" and action == "delete":
+        released = bool(release_bookings(db.select(Booking.id).where(*clauses)))
+        # A booking that took seats since the release above stays put
+        affected = delete_bookings(*clauses, Booking.seat_held.isnot(True))
+    elif action == "mark_paid":
+        affected = mark_paid(*clauses)
+    else:
+        affected = model.query.filter(*clauses).delete(synchronize_session=False)
+
+    db.session.add(AdminAudit(user_email=user_email, record_type=record_type, action=action,
+                              criteria=json.dumps(criteria, default=str), affected=affected))
+    db.session.commit()
+    if released:
+        availability_changed()
+    logger.info(f"Bulk {action} of {affected} {record_type} rows by {user_email}: {criteria}")
+    return affected
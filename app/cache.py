@@ -0,0 +1,251 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+
+class NullCache:
+    """Caches nothing; used when RESPONSE_CACHE_TYPE is "null"."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache:
+    """Per-process cache holding at most ``maxsize`` entries."""
+
+    def __init__(self, maxsize=256, default_timeout=300):
+        self.maxsize = maxsize
+        self.default_timeout = default_timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires and expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._data[key] = (time.time() + timeout if timeout else 0, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileSystemCache:
+    """Cache shared by every worker on one machine through a directory of pickles.
+
+    Holds at most ``maxsize`` entries: a write that goes over drops the
+    least recently written files.
+    """
+
+    def __init__(self, directory, default_timeout=300, maxsize=256):
+        self.directory = directory
+        self.default_timeout = default_timeout
+        self.maxsize = maxsize
+        os.makedirs(directory, exist_ok=True)
+
+    def _prune(self):
+        names = os.listdir(self.directory)
+        if len(names) <= self.maxsize:
+            return
+        entries = []
+        for name in names:
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except OSError:
+                pass
+        entries.sort()
+        for _, name in entries[:len(entries) - self.maxsize]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                expires, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires and expires < time.time():
+            self.delete(key)
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        # Write then rename so readers never see a half-written file
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((time.time() + timeout if timeout else 0, value), f)
+        os.replace(tmp, self._path(key))
+        self._prune()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class RedisCache:
+    """Cache shared across machines; needs the optional ``redis`` package."""
+
+    def __init__(self, url, default_timeout=300, prefix="satva:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_TYPE=redis needs the 'redis' package installed")
+        self._client = redis.Redis.from_url(url)
+        self.default_timeout = default_timeout
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        self._client.set(self.prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+def create_cache(config):
+    cache_type = config.get("RESPONSE_CACHE_TYPE", "lru")
+    timeout = config.get("RESPONSE_CACHE_TIMEOUT", 300)
+    if cache_type == "null":
+        return NullCache()
+    if cache_type == "filesystem":
+        return FileSystemCache(config.get("RESPONSE_CACHE_DIR")
+                               or os.path.join(tempfile.gettempdir(), "satva-page-cache"), timeout,
+                               config.get("RESPONSE_CACHE_SIZE", 256))
+    if cache_type == "redis":
+        return RedisCache(config.get("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"), timeout)
+    return LRUCache(config.get("RESPONSE_CACHE_SIZE", 256), timeout)
+
+
+def get_cache():
+    return current_app.extensions["response_cache"]
+
+
+def clear_page_cache():
+    get_cache().clear()
+
+
+def _build_version():
+    # Pages embed fingerprinted asset URLs; a new build must not be served old ones
+    from app.assets import build_version
+
+    return build_version(current_app.static_folder)
+
+
+def _bypass_cache():
+    # A pending flash message belongs to this visitor only
+    return request.method != "GET" or "_flashes" in session
+
+
+def cached_page(timeout=None):
+    """Serve a GET view from the response cache with ETag/Last-Modified validators.
+
+    Only for views whose output depends on nothing but the path: the query
+    string is not part of the key, so ``/?x=1``, ``/?x=2``... can't each
+    add an entry.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if _bypass_cache():
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            version = _build_version()
+            key = f"page:{version}:{request.path}"
+            entry = cache.get(key)
+            if entry is None:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = {
+                    "body": body,
+                    "mimetype": response.mimetype,
+                    "etag": f"{version}-{hashlib.sha1(body).hexdigest()}",
+                    "last_modified": int(time.time()),
+                }
+                cache.set(key, entry, timeout)
+
+            response = current_app.response_class(entry["body"], mimetype=entry["mimetype"])
+            response.set_etag(entry["etag"])
+            response.last_modified = entry["last_modified"]
+            # Let browsers keep the page but revalidate it, which costs a 304
+            response.headers["Cache-Control"] = "no-cache"
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
+def cached_fragment(key, render, timeout=None):
+    """Return a rendered fragment from the cache, rendering it on a miss."""
+    if _bypass_cache():
+        return render()
+    cache = get_cache()
+    key = f"fragment:{_build_version()}:{key}"
+    html = cache.get(key)
+    if html is None:
+        html = render()
+        cache.set(key, html, timeout)
+    return html
+
+
+def init_app(app):
+    app.extensions["response_cache"] = create_cache(app.config)
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import namedtuple
+
+from app.models import Plan
+
+PERIOD_LABELS = {"month": "महीना", "year": "वर्ष"}
+
+# The catalog rarely changes, so each worker keeps a copy. Edits made through
+# the admin clear it immediately in that worker; other workers pick the change
+# up once their copy is older than CATALOG_TTL seconds.
+CATALOG_TTL = 300
+
+
+class CatalogPlan(namedtuple("CatalogPlan", "id name price period description popular active full_day")):
+    @property
+    def amount(self):
+        """Price in paise, as the gateway expects."""
+        return self.price * 100
+
+    @property
+    def price_label(self):
+        return f"₹{self.price:,}/{PERIOD_LABELS.get(self.period, self.period)}"
+
+    @property
+    def label(self):
+        # Same text the old templates used as the option value, e.g. "गोल्ड प्लान ₹1000/महीना"
+        return f"{self.name} {self.price_label}"
+
+
+_cache = {"plans": None, "loaded_at": 0.0}
+_lock = threading.Lock()
+
+
+def _load():
+    rows = Plan.query.order_by(Plan.sort_order, Plan.id).all()
+    plans = tuple(CatalogPlan(p.id, p.name, p.price, p.period, p.description,
+                              bool(p.popular), bool(p.active), bool(p.full_day)) for p in rows)
+    by_key = {}
+    for plan in plans:
+        by_key[plan.id] = plan
+        # Bookings and links from before plan ids used the display text,
+        # written both as "₹1000" and "₹10,000"
+        by_key[plan.label] = plan
+        by_key[f"{plan.name} ₹{plan.price}/{PERIOD_LABELS.get(plan.period, plan.period)}"] = plan
+    return plans, by_key
+
+
+def _catalog():
+    with _lock:
+        if _cache["plans"] is None or time.monotonic() - _cache["loaded_at"] > CATALOG_TTL:
+            _cache["plans"], _cache["by_key"] = _load()
+            _cache["loaded_at"] = time.monotonic()
+        return _cache["plans"], _cache["by_key"]
+
+
+def invalidate_catalog():
+    with _lock:
+        _cache["plans"] = None
+
+
+def get_plans(include_inactive=False):
+    plans, _ = _catalog()
+    return [p for p in plans if include_inactive or p.active]
+
+
+def get_plan(key):
+    """Look a plan up by id (or legacy display label); None if unknown."""
+    _, by_key = _catalog()
+    return by_key.get(key)
@@ -3,8 +3,67 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def database_profile(url):
+    """DB_PROFILE if set, otherwise a guess from the URL and the gunicorn settings."""
+    if os.environ.get("DB_PROFILE"):
+        return os.environ["DB_PROFILE"]
+    if not url or url.startswith("sqlite"):
+        return "sqlite"
+    return "gunicorn" if _env_int("WEB_CONCURRENCY", 2) > 1 else "single"
+
+
+def database_engine_options(profile):
+    """SQLAlchemy engine options for a deployment profile.
+
+    sqlite     local development; the default pool, nothing to tune
+    single     one long-lived process (run.py, the order worker); a roomy pool
+    gunicorn   WEB_CONCURRENCY workers each with their own pool, sized to the
+               threads that can hold a connection at once (web threads, order
+               queue threads, and one each for the payment, contact and health
+               threads), so workers x (pool_size + max_overflow) stays below
+               the server's connection limit
+    pgbouncer  PgBouncer in transaction mode does the pooling; no app-side pool
+
+    Connections are recycled before typical idle timeouts instead of being
+    pinged on every checkout, and LIFO checkout lets surplus connections age
+    out. DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE and
+    DB_POOL_PRE_PING override any profile.
+    """
+    if profile == "sqlite":
+        options = {}
+    elif profile == "pgbouncer":
+        from sqlalchemy.pool import NullPool
+
+        options = {"poolclass": NullPool}
+    elif profile == "single":
+        options = {"pool_size": 10, "max_overflow": 10, "pool_timeout": 10,
+                   "pool_recycle": 280, "pool_use_lifo": True}
+    elif profile == "gunicorn":
+        threads = _env_int("GUNICORN_THREADS", 1)
+        options = {"pool_size": threads + 2, "max_overflow": _env_int("ORDER_QUEUE_THREADS", 2) + 1,
+                   "pool_timeout": 5, "pool_recycle": 280, "pool_use_lifo": True}
+    else:
+        raise ValueError(f"Unknown DB_PROFILE {profile!r}")
+
+    for name, option in (("DB_POOL_SIZE", "pool_size"), ("DB_MAX_OVERFLOW", "max_overflow"),
+                         ("DB_POOL_TIMEOUT", "pool_timeout"), ("DB_POOL_RECYCLE", "pool_recycle")):
+        if os.environ.get(name):
+            options[option] = int(os.environ[name])
+    if os.environ.get("DB_POOL_PRE_PING"):
+        options["pool_pre_ping"] = os.environ["DB_POOL_PRE_PING"] == "1"
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY") or "fallback_secret"
+    # Browsers don't send the session cookie on cross-site POSTs, so another site can't
+    # submit the admin forms (bulk delete etc.) on a logged-in admin's behalf
+    SESSION_COOKIE_SAMESITE = os.environ.get("SESSION_COOKIE_SAMESITE", "Lax")
 
     db_url = os.environ.get("DATABASE_URL")
     if db_url and db_url.startswith("postgres://"):
@@ -13,6 +72,105 @@ class Config:
     SQLALCHEMY_DATABASE_URI = db_url
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    SQLALCHEMY_POOL_RECYCLE = 280
-    SQLALCHEMY_POOL_TIMEOUT = 10
-    SQLALCHEMY_ENGINE_OPTIONS = {'pool_pre_ping': True}
+    # Flask-SQLAlchemy 3 only passes SQLALCHEMY_ENGINE_OPTIONS to the engine
+    DB_PROFILE = database_profile(db_url)
+    SQLALCHEMY_ENGINE_OPTIONS = database_engine_options(DB_PROFILE)
+
+    # Optional read replica for views marked @read_only (admin pages, exports); see app.replica.
+    # A visitor's reads stay on the primary for READ_YOUR_WRITES_SECONDS after they write, and
+    # a replica that fails its check or is over REPLICA_MAX_LAG seconds behind is skipped
+    # for REPLICA_RETRY_AFTER seconds
+    replica_url = os.environ.get("REPLICA_DATABASE_URL")
+    if replica_url and replica_url.startswith("postgres://"):
+        replica_url = replica_url.replace("postgres://", "postgresql://", 1)
+    # Bind options don't inherit SQLALCHEMY_ENGINE_OPTIONS
+    SQLALCHEMY_BINDS = {"replica": {"url": replica_url, **SQLALCHEMY_ENGINE_OPTIONS}} if replica_url else {}
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 5))
+    REPLICA_MAX_LAG = float(os.environ.get("REPLICA_MAX_LAG", 10))
+    REPLICA_RETRY_AFTER = float(os.environ.get("REPLICA_RETRY_AFTER", 30))
+
+    # "thread": orders are created by background threads in each web worker.
+    # "external": only the `flask order-worker` process creates them.
+    ORDER_QUEUE_MODE = os.environ.get("ORDER_QUEUE_MODE", "thread")
+    ORDER_QUEUE_THREADS = int(os.environ.get("ORDER_QUEUE_THREADS", 2))
+    # How long a booking may sit pending before the standalone worker takes it over
+    ORDER_SWEEP_AFTER = int(os.environ.get("ORDER_SWEEP_AFTER",
+                                           60 if ORDER_QUEUE_MODE == "thread" else 0))
+    # A booking the worker claimed but didn't finish in this many seconds is retried
+    ORDER_CLAIM_TIMEOUT = int(os.environ.get("ORDER_CLAIM_TIMEOUT", 120))
+
+    # Stale unpaid bookings are checked against the gateway by the worker every
+    # RECONCILE_INTERVAL seconds (0 disables; `flask reconcile-payments` runs it once)
+    RECONCILE_INTERVAL = int(os.environ.get("RECONCILE_INTERVAL", 300))
+    RECONCILE_CONCURRENCY = int(os.environ.get("RECONCILE_CONCURRENCY", 4))
+    RECONCILE_RATE = float(os.environ.get("RECONCILE_RATE", 10))
+    # Seats held by an unpaid booking are given back this many seconds after checkout
+    # (a payment that still arrives later takes them again if they are free)
+    SEAT_HOLD_TTL = int(os.environ.get("SEAT_HOLD_TTL", 900))
+    # Furthest start date accepted by the booking form, in days from today
+    BOOKING_HORIZON_DAYS = int(os.environ.get("BOOKING_HORIZON_DAYS", 60))
+    # The worker recomputes seat counters from bookings this often, to correct drift (0 disables)
+    RECOUNT_INTERVAL = int(os.environ.get("RECOUNT_INTERVAL", 3600))
+
+    # Rendered marketing pages: "lru" (per worker), "filesystem", "redis" or "null"
+    RESPONSE_CACHE_TYPE = os.environ.get("RESPONSE_CACHE_TYPE", "lru")
+    RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300))
+    RESPONSE_CACHE_DIR = os.environ.get("RESPONSE_CACHE_DIR")
+    # Most entries kept by the "lru" and "filesystem" backends
+    RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", 256))
+    RESPONSE_CACHE_REDIS_URL = os.environ.get("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # Seats-left numbers are cached this long (and dropped as soon as this worker changes them)
+    AVAILABILITY_CACHE_TTL = int(os.environ.get("AVAILABILITY_CACHE_TTL", 15))
+
+    # Health probes read a sample taken in the background every HEALTH_INTERVAL seconds;
+    # /readyz fails while the pool is at least HEALTH_MAX_POOL_SATURATION full
+    HEALTH_INTERVAL = float(os.environ.get("HEALTH_INTERVAL", 15))
+    HEALTH_CHECK_GATEWAY = os.environ.get("HEALTH_CHECK_GATEWAY", "1") == "1"
+    HEALTH_GATEWAY_TIMEOUT = float(os.environ.get("HEALTH_GATEWAY_TIMEOUT", 5))
+    HEALTH_MAX_POOL_SATURATION = float(os.environ.get("HEALTH_MAX_POOL_SATURATION", 1.0))
+
+    # Prometheus metrics at /metrics. Set METRICS_DIR (one directory per machine) to
+    # add up all gunicorn workers. The endpoint is only served with METRICS_TOKEN set, and then
+    # requires "Authorization: Bearer <token>", or with METRICS_PUBLIC=1 to open it to anyone
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_DUMP_INTERVAL = float(os.environ.get("METRICS_DUMP_INTERVAL", 5))
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC") == "1"
+
+    # Proxies in front of the app (Heroku/Render routers: 1) whose X-Forwarded-For is trusted
+    # for the client address; 0 when the app is exposed directly
+    TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 1))
+
+    # Password hashes use werkzeug's method string with explicit parameters; tune it with
+    # scripts/bench_hash.py on the production machine. Older hashes are upgraded at login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # Hashes running at once on the machine, across all workers (keep it below WEB_CONCURRENCY),
+    # and how long a login waits for one before answering 503; slots are lock files in
+    # PASSWORD_HASH_LOCK_DIR (default: a directory under the system temp dir)
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 1))
+    PASSWORD_HASH_WAIT = float(os.environ.get("PASSWORD_HASH_WAIT", 0.5))
+    PASSWORD_HASH_LOCK_DIR = os.environ.get("PASSWORD_HASH_LOCK_DIR")
+    # Failed logins: free attempts per account and per IP, then a lockout that doubles
+    # from LOGIN_LOCKOUT_BASE up to LOGIN_LOCKOUT_MAX seconds; counts reset after the window
+    LOGIN_FREE_ATTEMPTS = int(os.environ.get("LOGIN_FREE_ATTEMPTS", 5))
+    LOGIN_FREE_ATTEMPTS_PER_IP = int(os.environ.get("LOGIN_FREE_ATTEMPTS_PER_IP", 20))
+    LOGIN_LOCKOUT_BASE = int(os.environ.get("LOGIN_LOCKOUT_BASE", 2))
+    LOGIN_LOCKOUT_MAX = int(os.environ.get("LOGIN_LOCKOUT_MAX", 900))
+    LOGIN_FAILURE_WINDOW = int(os.environ.get("LOGIN_FAILURE_WINDOW", 900))
+    # Where the counts are kept: "memory" (per worker, at most LOGIN_THROTTLE_MAX_KEYS) or
+    # "redis" at RESPONSE_CACHE_REDIS_URL; never the response cache, which anyone can churn
+    LOGIN_THROTTLE_STORE = os.environ.get("LOGIN_THROTTLE_STORE", "memory")
+    LOGIN_THROTTLE_MAX_KEYS = int(os.environ.get("LOGIN_THROTTLE_MAX_KEYS", 10000))
+
+    # Contact form: per-IP token bucket ("memory" per worker, or "redis" at
+    # RESPONSE_CACHE_REDIS_URL to share it), spam cut-off and write batching
+    CONTACT_RATE_PER_MINUTE = float(os.environ.get("CONTACT_RATE_PER_MINUTE", 3))
+    CONTACT_RATE_BURST = int(os.environ.get("CONTACT_RATE_BURST", 3))
+    CONTACT_RATE_LIMIT_STORE = os.environ.get("CONTACT_RATE_LIMIT_STORE", "memory")
+    CONTACT_SPAM_THRESHOLD = int(os.environ.get("CONTACT_SPAM_THRESHOLD", 5))
+    CONTACT_BATCH_SIZE = int(os.environ.get("CONTACT_BATCH_SIZE", 50))
+    CONTACT_FLUSH_INTERVAL = float(os.environ.get("CONTACT_FLUSH_INTERVAL", 2))
+
+    # Normally `flask build-images` runs at build time (bin/post_compile); this is for hosts without a build step
+    IMAGE_BUILD_ON_STARTUP = os.environ.get("IMAGE_BUILD_ON_STARTUP") == "1"
@@ -0,0 +1,145 @@
+import atexit
+import logging
+import re
+import threading
+import time
+
+from sqlalchemy import insert
+
+from app.models import Contact, db
+from app.ratelimit import KeyedRateLimiter, RedisRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Hidden form field only bots fill in
+HONEYPOT_FIELD = "website"
+
+URL_RE = re.compile(r"https?://|www\.|\[url|<a\s", re.IGNORECASE)
+SPAM_WORDS = re.compile(r"\b(casino|viagra|crypto|bitcoin|forex|loan|seo|backlinks?|porn|betting)\b",
+                        re.IGNORECASE)
+CYRILLIC_RE = re.compile(r"[Ѐ-ӿ]")
+
+
+def spam_score(name, email, number, message, honeypot=""):
+    """Cheap heuristic score for a contact submission; CONTACT_SPAM_THRESHOLD and up is spam."""
+    score = 0
+    if honeypot:
+        score += 10
+    links = len(URL_RE.findall(message)) + len(URL_RE.findall(name))
+    score += 2 * min(links, 3)
+    score += 2 * min(len(SPAM_WORDS.findall(message)), 3)
+    if CYRILLIC_RE.search(message) or CYRILLIC_RE.search(name):
+        score += 2
+    digits = re.sub(r"\D", "", number)
+    if number and not 10 <= len(digits) <= 13:
+        score += 1
+    if len(message) > 2000:
+        score += 2
+    if len(name) > 60 or "@" in name:
+        score += 2
+    if email.count("@") != 1:
+        score += 3
+    return score
+
+
+class ContactBuffer:
+    """Collects contact submissions and writes them in batches.
+
+    A batch is inserted with one executemany INSERT and one commit as soon
+    as ``batch_size`` rows are waiting, and otherwise by a daemon thread every
+    ``flush_interval`` seconds, so a message reaches the admin page within
+    that time. The thread is started lazily, after gunicorn has forked, and
+    whatever is left is flushed at exit; rows still buffered when a worker
+    is killed outright are lost. While the database is unreachable rows are
+    kept for retry, up to ``max_buffered``.
+    """
+
+    def __init__(self, app, batch_size=50, flush_interval=2.0, max_buffered=1000):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+        self._rows = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, row):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="contact-buffer", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Insert everything buffered so far; returns the number of rows written."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return 0
+        try:
+            with self.app.app_context():
+                db.session.execute(insert(Contact), rows)
+                db.session.commit()
+        except Exception as e:
+            logger.error(f"Could not save {len(rows)} contact messages, will retry: {e}")
+            with self._lock:
+                self._rows[:0] = rows
+                dropped = len(self._rows) - self.max_buffered
+                if dropped > 0:
+                    del self._rows[:dropped]
+                    logger.error(f"Contact buffer full, dropped {dropped} oldest messages")
+            return 0
+        logger.info(f"Saved {len(rows)} contact messages")
+        return len(rows)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+
+def create_rate_limiter(config):
+    rate = config.get("CONTACT_RATE_PER_MINUTE", 3) / 60.0
+    burst = config.get("CONTACT_RATE_BURST", 3)
+    if config.get("CONTACT_RATE_LIMIT_STORE", "memory") == "redis":
+        return RedisRateLimiter(config.get("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+                                rate, burst)
+    return KeyedRateLimiter(rate, burst)
+
+
+def submit_contact(form, client_ip):
+    """Rate-limit, score and queue one contact form POST.
+
+    Returns "limited", "spam" or "queued"; spam is dropped without telling
+    the sender.
+    """
+    from flask import current_app
+
+    if not current_app.extensions["contact_limiter"].allow(client_ip):
+        logger.warning(f"Contact form rate limit hit by {client_ip}")
+        return "limited"
+
+    row = {
+        "Name": form.get("name", "").strip()[:100],
+        "Email": form.get("email", "").strip()[:120],
+        "Number": form.get("number", "").strip()[:20],
+        "Message": form.get("message", "").strip(),
+    }
+    score = spam_score(row["Name"], row["Email"], row["Number"], row["Message"],
+                       form.get(HONEYPOT_FIELD, ""))
+    if score >= current_app.config.get("CONTACT_SPAM_THRESHOLD", 5):
+        logger.info(f"Dropped contact message from {client_ip} with spam score {score}")
+        return "spam"
+
+    current_app.extensions["contact_buffer"].add(row)
+    return "queued"
+
+
+def init_app(app):
+    app.extensions["contact_limiter"] = create_rate_limiter(app.config)
+    app.extensions["contact_buffer"] = ContactBuffer(app, app.config.get("CONTACT_BATCH_SIZE", 50),
+                                                     app.config.get("CONTACT_FLUSH_INTERVAL", 2.0))
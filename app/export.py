@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from datetime import date
+
+from app.models import Booking, Contact, db
+
+# Rows fetched from the server-side cursor at a time; also one chunk of output
+EXPORT_BATCH = 1000
+
+EXPORT_COLUMNS = {
+    "booking": [Booking.id, Booking.name, Booking.email, Booking.phone, Booking.plan_id,
+                Booking.start_date, Booking.end_date, Booking.shift_id, Booking.status,
+                Booking.paid, Booking.amount, Booking.razorpay_order_id, Booking.created_at],
+    "contact": [Contact.id, Contact.Name, Contact.Email, Contact.Number, Contact.Message],
+}
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+
+
+def _csv_cell(value):
+    # Spreadsheets run cells starting with these as formulas; phone numbers are fine
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@") and not value[1:].replace(" ", "").isdigit():
+        return "'" + value
+    return value
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def export_rows(record_type, clauses, fmt):
+    """Yield the matching rows as CSV or JSONL text, one batch per chunk.
+
+    Rows come from a server-side cursor ``EXPORT_BATCH`` at a time as plain
+    tuples, never ORM objects, so memory stays flat however many rows match
+    and the first bytes go out as soon as the first batch is read.
+    """
+    columns = EXPORT_COLUMNS[record_type]
+    names = [c.key for c in columns]
+    result = db.session.execute(
+        db.select(*columns).where(*clauses).order_by(columns[0])
+        .execution_options(stream_results=True, yield_per=EXPORT_BATCH))
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if fmt == "csv":
+        writer.writerow(names)
+    for batch in result.partitions():
+        for row in batch:
+            if fmt == "csv":
+                writer.writerow([_csv_cell(value) for value in row])
+            else:
+                buffer.write(json.dumps(dict(zip(names, map(_json_value, row))), ensure_ascii=False))
+                buffer.write("\n")
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.getvalue():  # Header of an empty CSV export
+        yield buffer.getvalue()
@@ -0,0 +1,142 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+from sqlalchemy import text
+
+from app import replica
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+
+def _gateway_url():
+    return os.environ.get("RAZORPAY_BASE_URL") or "https://api.razorpay.com"
+
+
+def check_database():
+    started = time.monotonic()
+    try:
+        db.session.execute(text("SELECT 1"))
+        return {"ok": True, "seconds": round(time.monotonic() - started, 4)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)}
+    finally:
+        db.session.remove()
+
+
+def check_replica():
+    """None without a replica; otherwise whether reads may go to it right now."""
+    engine = db.engines.get(replica.REPLICA_BIND)
+    if engine is None:
+        return None
+    return {"ok": replica.check_replica(engine) and replica.replica_available()}
+
+
+def check_pool():
+    """Connections checked out of this worker's pool against the most it can hand out."""
+    pool = db.engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {"status": pool.status()}
+    in_use = pool.checkedout()
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if max_overflow < 0:  # Unbounded overflow never saturates
+        return {"in_use": in_use, "limit": None}
+    limit = pool.size() + max_overflow
+    return {"in_use": in_use, "limit": limit, "saturation": round(in_use / limit, 2) if limit else 0.0}
+
+
+def check_gateway(timeout):
+    url = _gateway_url()
+    result = {}
+    try:
+        result["dns"] = f"Success: {socket.gethostbyname(urlparse(url).hostname)}"
+    except (socket.gaierror, TypeError) as e:
+        result["dns"] = f"Failed: {e}"
+    try:
+        response = requests.get(url, timeout=(min(timeout, 3.05), timeout))
+        result["http"] = f"Success: Status {response.status_code}"
+    except requests.exceptions.RequestException as e:
+        result["http"] = f"Failed: {e}"
+    result["ok"] = result["http"].startswith("Success")
+    return result
+
+
+class HealthSampler:
+    """Background thread that runs the dependency checks every ``interval`` seconds.
+
+    Probe endpoints only read the last sample, so a load balancer hitting
+    them often costs nothing and never waits on the database or the
+    network. The thread is started on the first read, after gunicorn has
+    forked.
+    """
+
+    def __init__(self, app, interval=15.0, gateway_timeout=5.0, check_gateway=True):
+        self.app = app
+        self.interval = interval
+        self.gateway_timeout = gateway_timeout
+        self.check_gateway = check_gateway
+        self.sample = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def run_checks(self):
+        with self.app.app_context():
+            sample = {"database": check_database(), "pool": check_pool(), "replica": check_replica(),
+                      "sampled_at": datetime.utcnow().isoformat(timespec="seconds"),
+                      "monotonic": time.monotonic()}
+        previous = self.sample or {}
+        if "gateway" in previous:
+            sample["gateway"] = previous["gateway"]
+        # Publish the database result before the slower gateway check, which
+        # doesn't decide readiness and so must not make the sample go stale
+        self.sample = sample
+        if self.check_gateway:
+            self.sample = {**sample, "gateway": check_gateway(self.gateway_timeout)}
+        return self.sample
+
+    def _run(self):
+        while True:
+            try:
+                self.run_checks()
+            except Exception as e:
+                logger.error(f"Health sampler failed: {e}")
+            time.sleep(self.interval)
+
+    def latest(self):
+        """The last sample (None until the first one finishes); never blocks on a check."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="health-sampler", daemon=True)
+                self._thread.start()
+        return self.sample
+
+
+def readiness(sample, interval, max_saturation):
+    """(ready, reason) for a sample; a stale sample means the sampler is stuck."""
+    if sample is None:
+        return False, "starting"
+    if time.monotonic() - sample["monotonic"] > 3 * interval:
+        return False, "health sample is stale"
+    if not sample["database"]["ok"]:
+        return False, "database unavailable"
+    if sample["pool"].get("saturation", 0) >= max_saturation:
+        return False, "database pool saturated"
+    return True, "ok"
+
+
+def get_sampler():
+    from flask import current_app
+
+    return current_app.extensions["health_sampler"]
+
+
+def init_app(app):
+    app.extensions["health_sampler"] = HealthSampler(app, app.config.get("HEALTH_INTERVAL", 15),
+                                                     app.config.get("HEALTH_GATEWAY_TIMEOUT", 5),
+                                                     app.config.get("HEALTH_CHECK_GATEWAY", True))
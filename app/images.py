@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+VARIANT_WIDTHS = (320, 640, 1280, 1920)
+VARIANT_DIR = "img/variants"  # Relative to the static folder
+MANIFEST_NAME = "manifest.json"
+
+# Preferred first: browsers take the first <source> type they support
+FORMATS = (
+    ("avif", "image/avif", {"quality": 50}),
+    ("webp", "image/webp", {"quality": 75, "method": 6}),
+    ("jpeg", "image/jpeg", {"quality": 78, "optimize": True, "progressive": True}),
+)
+
+_manifest_cache = {}
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def build_variants(static_folder, widths=VARIANT_WIDTHS):
+    """Write resized AVIF/WebP/JPEG copies of every image in static/img.
+
+    Output names carry the source's content hash, so unchanged images are
+    skipped on the next run and a changed image never reuses a stale file.
+    Returns the manifest that :func:`responsive_img` reads.
+    """
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        raise RuntimeError("Building image variants needs Pillow (pip install Pillow)")
+
+    source_dir = os.path.join(static_folder, "img")
+    output_dir = os.path.join(static_folder, VARIANT_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+    formats = [f for f in FORMATS if f[0] != "avif" or features.check("avif")]
+
+    manifest = {}
+    for name in sorted(os.listdir(source_dir)):
+        source = os.path.join(source_dir, name)
+        if not name.lower().endswith(SOURCE_EXTENSIONS) or not os.path.isfile(source):
+            continue
+
+        stem = os.path.splitext(name)[0]
+        digest = _file_hash(source)
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGB")
+            entry = {"width": image.width, "height": image.height, "sources": {}}
+
+            # Never upscale; keep full size as the last step when it fits under the cap
+            targets = [w for w in widths if w < image.width]
+            if image.width <= widths[-1]:
+                targets.append(image.width)
+            for fmt, mime, options in formats:
+                srcset = []
+                for width in targets:
+                    filename = f"{stem}-{digest}-{width}.{fmt}"
+                    path = os.path.join(output_dir, filename)
+                    if not os.path.exists(path):
+                        height = round(image.height * width / image.width)
+                        resized = image.resize((width, height), Image.LANCZOS)
+                        if fmt == "jpeg" and resized.mode == "RGBA":
+                            resized = resized.convert("RGB")
+                        resized.save(path, fmt.upper(), **options)
+                    srcset.append([f"{VARIANT_DIR}/{filename}", width])
+                entry["sources"][mime] = srcset
+        manifest[f"img/{name}"] = entry
+        logger.info(f"Image variants ready for {name}")
+
+    # Drop variants left over from images that changed or were removed
+    keep = {os.path.basename(p) for e in manifest.values() for s in e["sources"].values() for p, _ in s}
+    for filename in os.listdir(output_dir):
+        if filename != MANIFEST_NAME and filename not in keep:
+            os.remove(os.path.join(output_dir, filename))
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    _manifest_cache.clear()
+    return manifest
+
+
+def load_manifest(static_folder):
+    if static_folder not in _manifest_cache:
+        path = os.path.join(static_folder, VARIANT_DIR, MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                _manifest_cache[static_folder] = json.load(f)
+        except (OSError, ValueError):
+            # Pipeline not run yet: fall back to the original files
+            _manifest_cache[static_folder] = {}
+    return _manifest_cache[static_folder]
+
+
+def responsive_img(filename, alt="", sizes="100vw", css_class=None, lazy=True):
+    """<picture> markup with srcset/sizes for every generated format.
+
+    ``data-full`` points at the largest variant for the gallery lightbox.
+    """
+    entry = load_manifest(current_app.static_folder).get(filename)
+    attrs = f'alt="{escape(alt)}"'
+    if css_class:
+        attrs += f' class="{escape(css_class)}"'
+    if lazy:
+        attrs += ' loading="lazy" decoding="async"'
+
+    if entry is None:
+        return Markup(f'<img src="{url_for("static", filename=filename)}" {attrs}>')
+
+    from app.assets import asset_url
+
+    def srcset(candidates):
+        return ", ".join(f'{asset_url(path)} {width}w' for path, width in candidates)
+
+    parts = ["<picture>"]
+    for mime, candidates in entry["sources"].items():
+        if mime != "image/jpeg":
+            parts.append(f'<source type="{mime}" srcset="{srcset(candidates)}" sizes="{escape(sizes)}">')
+    fallback = entry["sources"]["image/jpeg"]
+    largest = (entry["sources"].get("image/webp") or fallback)[-1][0]
+    parts.append(
+        f'<img src="{asset_url(fallback[0][0])}" srcset="{srcset(fallback)}" '
+        f'sizes="{escape(sizes)}" width="{entry["width"]}" height="{entry["height"]}" '
+        f'data-full="{asset_url(largest)}" {attrs}>'
+    )
+    parts.append("</picture>")
+    return Markup("".join(parts))
+
+
+def init_app(app):
+    app.jinja_env.globals["responsive_img"] = responsive_img
+
+    @app.cli.command("build-images")
+    def build_images():
+        """Generate resized AVIF/WebP/JPEG variants of static/img."""
+        manifest = build_variants(app.static_folder)
+        print(f"Built variants for {len(manifest)} images")
+
+    if app.config.get("IMAGE_BUILD_ON_STARTUP"):
+        try:
+            build_variants(app.static_folder)
+        except Exception as e:
+            logger.error(f"Image variant build failed, serving originals: {e}")
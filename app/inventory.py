@@ -0,0 +1,276 @@
+import calendar
+import logging
+import uuid
+from datetime import date, timedelta
+
+import click
+from sqlalchemy import update
+
+from app.models import Booking, Plan, Shift, SlotInventory, db, dialect_insert
+
+logger = logging.getLogger(__name__)
+
+# Days of availability shown on the booking form
+AVAILABILITY_DAYS = 14
+# Furthest start date the booking form accepts, in days from today
+BOOKING_HORIZON_DAYS = 60
+GENERATION_KEY = "availability:generation"
+
+
+def _add_months(day, months):
+    year, month = divmod(day.month - 1 + months, 12)
+    year += day.year
+    return day.replace(year=year, month=month + 1,
+                       day=min(day.day, calendar.monthrange(year, month + 1)[1]))
+
+
+def plan_end_date(period, start):
+    """Last day covered by a plan starting on ``start``."""
+    return _add_months(start, 12 if period == "year" else 1) - timedelta(days=1)
+
+
+def get_shifts():
+    return Shift.query.filter(Shift.active.isnot(False)).order_by(Shift.sort_order, Shift.id).all()
+
+
+def booking_shifts(full_day, shift_id):
+    """Shift ids a booking occupies: all of them for full-day plans."""
+    if full_day or shift_id is None:
+        return [s.id for s in get_shifts()]
+    return [shift_id]
+
+
+def ensure_inventory(shift_ids, start, end):
+    """Create any missing SlotInventory rows for the range, in the caller's transaction.
+
+    Rows exist once per (date, shift) for good, so after the first booking
+    for a date this is a single COUNT. Missing rows are inserted with ON
+    CONFLICT DO NOTHING, so a checkout racing another one for a new date
+    still commits once, together with its booking.
+    """
+    in_range = (SlotInventory.date.between(start, end), SlotInventory.shift_id.in_(shift_ids))
+    if SlotInventory.query.filter(*in_range).count() == len(shift_ids) * ((end - start).days + 1):
+        return
+    existing = set(db.session.query(SlotInventory.date, SlotInventory.shift_id).filter(*in_range))
+    capacities = dict(db.session.query(Shift.id, Shift.capacity).filter(Shift.id.in_(shift_ids)))
+    missing = []
+    day = start
+    while day <= end:
+        for shift_id in shift_ids:
+            if (day, shift_id) not in existing:
+                missing.append({"date": day, "shift_id": shift_id,
+                                "capacity": capacities[shift_id], "booked": 0})
+        day += timedelta(days=1)
+    if missing:
+        db.session.execute(dialect_insert(SlotInventory.__table__)
+                           .on_conflict_do_nothing(index_elements=["date", "shift_id"]), missing)
+
+
+def allocate(shift_ids, start, end):
+    """Take one seat in every (date, shift) of the range, in the caller's transaction.
+
+    A single conditional UPDATE bumps only rows that still have room, so
+    concurrent bookings can never push ``booked`` past ``capacity``. Returns
+    False if any row was full; the caller must then roll back, which also
+    undoes the rows that were bumped.
+    """
+    expected = len(shift_ids) * ((end - start).days + 1)
+    updated = (SlotInventory.query
+               .filter(SlotInventory.date.between(start, end),
+                       SlotInventory.shift_id.in_(shift_ids),
+                       SlotInventory.booked < SlotInventory.capacity)
+               .update({"booked": SlotInventory.booked + 1}, synchronize_session=False))
+    return updated == expected
+
+
+def release_bookings(booking_ids):
+    """Give back the seats held by the bookings in ``booking_ids``, in the caller's transaction.
+
+    ``booking_ids`` may be a list or a SELECT of ids. Two statements however
+    many bookings there are: ``seat_held`` is cleared with a conditional
+    UPDATE ... RETURNING, so racing expiry and delete paths never release the
+    same seats twice, then each inventory row drops by the number of released
+    bookings covering it, counted as in :func:`recount_inventory`. Returns how
+    many bookings gave seats back.
+    """
+    released = db.session.execute(update(Booking)
+                                  .where(Booking.id.in_(booking_ids), Booking.seat_held.is_(True))
+                                  .values(seat_held=False)
+                                  .returning(Booking.id, Booking.start_date, Booking.end_date)
+                                  .execution_options(synchronize_session=False)).all()
+    spans = [row for row in released if row.end_date is not None]
+    if not spans:
+        return len(released)
+    covering = (db.session.query(db.func.count(Booking.id))
+                .filter(Booking.id.in_([row.id for row in spans]),
+                        SlotInventory.date.between(Booking.start_date, Booking.end_date),
+                        db.or_(Booking.shift_id == SlotInventory.shift_id, Booking.shift_id.is_(None)))
+                .scalar_subquery())
+    (SlotInventory.query
+     .filter(SlotInventory.date.between(min(row.start_date for row in spans), max(row.end_date for row in spans)),
+             SlotInventory.booked > 0, covering > 0)
+     .update({"booked": db.case((SlotInventory.booked > covering, SlotInventory.booked - covering), else_=0)},
+             synchronize_session=False))
+    return len(released)
+
+
+def release(booking_id):
+    """Give back the seats one booking holds; False if it held none."""
+    return release_bookings([booking_id]) > 0
+
+
+def reclaim(booking_id):
+    """Take seats again for a booking that gave them back, in the caller's transaction.
+
+    For a failed order that is retried or an expired booking that gets paid
+    after all. The rows are locked and checked before any is bumped, so
+    unlike :func:`allocate` a full shift needs no rollback: returns False
+    and changes nothing.
+    """
+    booking = (db.session.query(Booking.start_date, Booking.end_date, Booking.shift_id, Booking.seat_held,
+                                Plan.full_day)
+               .outerjoin(Plan, Plan.id == Booking.plan_id)
+               .filter(Booking.id == booking_id)
+               .one())
+    # Legacy bookings predate the inventory and never hold seats
+    if booking.seat_held or booking.end_date is None:
+        return True
+    shift_ids = booking_shifts(booking.full_day, booking.shift_id)
+    ensure_inventory(shift_ids, booking.start_date, booking.end_date)
+    free = (db.session.query(SlotInventory.id)
+            .filter(SlotInventory.date.between(booking.start_date, booking.end_date),
+                    SlotInventory.shift_id.in_(shift_ids),
+                    SlotInventory.booked < SlotInventory.capacity)
+            .with_for_update()
+            .all())
+    if len(free) != len(shift_ids) * ((booking.end_date - booking.start_date).days + 1):
+        return False
+    claimed = (Booking.query
+               .filter_by(id=booking_id, seat_held=False)
+               .update({"seat_held": True}, synchronize_session=False))
+    return not claimed or allocate(shift_ids, booking.start_date, booking.end_date)
+
+
+def expire_bookings(booking_ids):
+    """Expire still-unpaid bookings and give their seats back; returns how many expired.
+
+    ``booking_ids`` may be a list or a SELECT of ids. Runs in the caller's
+    transaction.
+    """
+    expired = (Booking.query
+               .filter(Booking.id.in_(booking_ids), Booking.paid.isnot(True),
+                       Booking.status != "expired")
+               .update({"status": "expired"}, synchronize_session=False))
+    release_bookings(db.select(Booking.id).where(Booking.id.in_(booking_ids), Booking.status == "expired"))
+    return expired
+
+
+def availability(start=None, days=AVAILABILITY_DAYS):
+    """Seats left per shift for each day from ``start``, in the /api/availability shape."""
+    start = start or date.today()
+    end = start + timedelta(days=days - 1)
+    shifts = get_shifts()
+    left = {(r.date, r.shift_id): r.capacity - r.booked
+            for r in (db.session.query(SlotInventory.date, SlotInventory.shift_id,
+                                       SlotInventory.capacity, SlotInventory.booked)
+                      .filter(SlotInventory.date.between(start, end)))}
+    dates = [start + timedelta(days=i) for i in range(days)]
+    return {
+        "from": start.isoformat(),
+        "shifts": [{"id": s.id, "name": s.name, "capacity": s.capacity} for s in shifts],
+        "days": [{"date": day.isoformat(),
+                  "seats_left": {s.id: left.get((day, s.id), s.capacity) for s in shifts}}
+                 for day in dates],
+    }
+
+
+def cached_availability(start=None, days=AVAILABILITY_DAYS):
+    """:func:`availability` through the response cache.
+
+    Entries live for AVAILABILITY_CACHE_TTL seconds at most, and every
+    allocation or release starts a new cache generation, so a worker that
+    made a change never serves numbers from before it. Only the default
+    window (from today) is cached, so callers can't fill the shared cache
+    with one entry per (start, days) pair.
+    """
+    from flask import current_app
+    from app.cache import get_cache
+
+    start = start or date.today()
+    if start != date.today() or days != AVAILABILITY_DAYS:
+        return availability(start, days)
+    cache = get_cache()
+    key = f"availability:{cache.get(GENERATION_KEY) or 0}:{start.isoformat()}:{days}"
+    data = cache.get(key)
+    if data is None:
+        data = availability(start, days)
+        cache.set(key, data, current_app.config.get("AVAILABILITY_CACHE_TTL", 15))
+    return data
+
+
+def availability_changed():
+    """Call after committing anything that moves seat counters."""
+    from app.cache import get_cache
+
+    get_cache().set(GENERATION_KEY, uuid.uuid4().hex, 0)
+
+
+def recount_inventory(start=None, window=31):
+    """Recompute ``booked`` from the bookings holding seats, fixing any drift.
+
+    Incremental updates keep the counters right as long as every path goes
+    through :func:`allocate` and :func:`release`; this corrects anything
+    that did not (manual SQL, a crash between statements). Works through
+    ``window`` days at a time from ``start`` (default today), locking those
+    rows so allocations wait instead of racing the recount. Returns the
+    number of rows that were wrong.
+    """
+    start = start or date.today()
+    last = db.session.query(db.func.max(SlotInventory.date)).scalar()
+    fixed = 0
+    while last is not None and start <= last:
+        end = start + timedelta(days=window - 1)
+        held = (db.session.query(db.func.count(Booking.id))
+                .filter(Booking.seat_held.is_(True),
+                        SlotInventory.date.between(Booking.start_date, Booking.end_date),
+                        db.or_(Booking.shift_id == SlotInventory.shift_id, Booking.shift_id.is_(None)))
+                .scalar_subquery())
+        in_window = SlotInventory.date.between(start, end)
+        # Lock the window so allocations wait for the recount instead of racing it
+        db.session.query(SlotInventory.id).filter(in_window).with_for_update().all()
+        drifted = (SlotInventory.query
+                   .filter(in_window, SlotInventory.booked != held)
+                   .update({"booked": held}, synchronize_session=False))
+        db.session.commit()
+        if drifted:
+            logger.warning(f"Recount fixed {drifted} inventory rows between {start} and {end}")
+        fixed += drifted
+        start = end + timedelta(days=1)
+    if fixed:
+        availability_changed()
+    return fixed
+
+
+def init_app(app):
+    @app.cli.command("set-shift-capacity")
+    @click.argument("shift_id")
+    @click.argument("seats", type=int)
+    def set_shift_capacity(shift_id, seats):
+        """Change the seats in a shift, for it and every future date."""
+        shift = db.session.get(Shift, shift_id)
+        if shift is None:
+            raise click.BadParameter(f"No shift {shift_id!r}")
+        shift.capacity = seats
+        # Never drop below seats already sold
+        (SlotInventory.query
+         .filter(SlotInventory.shift_id == shift_id, SlotInventory.date >= date.today())
+         .update({"capacity": db.case((SlotInventory.booked > seats, SlotInventory.booked), else_=seats)},
+                 synchronize_session=False))
+        db.session.commit()
+        availability_changed()
+        print(f"{shift_id}: {seats} seats")
+
+    @app.cli.command("recount-inventory")
+    def recount_inventory_command():
+        """Recompute seat counters from bookings (the worker also does this periodically)."""
+        print(f"Fixed {recount_inventory()} inventory rows")
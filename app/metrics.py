@@ -0,0 +1,265 @@
+import bisect
+import glob
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def state(self):
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(into, state):
+        for labels, value in state.items():
+            into[labels] = into.get(labels, 0.0) + value
+
+    def render(self, state):
+        for labels, value in sorted(state.items()):
+            yield f"{self.name}{_label_text(self.labels, labels)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [count per bucket..., count above the last, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+
+    def state(self):
+        with self._lock:
+            return {labels: list(row) for labels, row in self._values.items()}
+
+    @staticmethod
+    def merge(into, state):
+        for labels, row in state.items():
+            if labels in into:
+                into[labels] = [a + b for a, b in zip(into[labels], row)]
+            else:
+                into[labels] = list(row)
+
+    def render(self, state):
+        for labels, row in sorted(state.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_label_text(self.labels, labels, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labels, labels)} {row[-1]}"
+            yield f"{self.name}_count{_label_text(self.labels, labels)} {cumulative}"
+
+
+REQUEST_SECONDS = Histogram("satva_request_duration_seconds", "Time to build each response, by endpoint.",
+                            ("endpoint", "method", "status"))
+REQUEST_SQL_QUERIES = Histogram("satva_request_sql_queries", "SQL statements run per request.",
+                                ("endpoint",), COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram("satva_request_sql_seconds", "Time spent in SQL per request.", ("endpoint",))
+POOL_WAIT_SECONDS = Histogram("satva_db_pool_wait_seconds",
+                              "Time a session waited for a pooled database connection.")
+POOL_EVENTS = Counter("satva_db_pool_events_total",
+                      "Connection pool events: connect, checkout, checkin, invalidate, close.", ("event",))
+GATEWAY_SECONDS = Histogram("satva_gateway_call_seconds", "Payment gateway call attempts.",
+                            ("operation", "outcome"))
+GATEWAY_RETRIES = Counter("satva_gateway_retries_total", "Gateway calls retried after a failure.",
+                          ("operation",))
+GATEWAY_REJECTED = Counter("satva_gateway_circuit_open_total",
+                           "Gateway calls refused because the circuit was open.", ("operation",))
+
+
+def snapshot():
+    return {metric.name: metric.state() for metric in REGISTRY}
+
+
+def dump(directory):
+    """Write this process's metrics to ``directory`` for the others to merge."""
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(snapshot(), f)
+    os.replace(tmp, dump_path(directory, os.getpid()))
+
+
+def dump_path(directory, pid):
+    return os.path.join(directory, f"{pid}.metrics")
+
+
+def remove_dumps(directory, pid="*"):
+    """Delete the dump of worker ``pid``, or of every worker.
+
+    Called by gunicorn when a worker exits and when the master starts, so
+    the numbers of dead workers aren't added up forever.
+    """
+    for path in glob.glob(dump_path(directory, pid)):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def collect(directory=None):
+    """Current metrics of this process, or of every process dumping to ``directory``."""
+    if not directory:
+        return snapshot()
+    dump(directory)
+    merged = {metric.name: {} for metric in REGISTRY}
+    by_name = {metric.name: metric for metric in REGISTRY}
+    for path in glob.glob(dump_path(directory, "*")):
+        try:
+            with open(path, "rb") as f:
+                states = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            continue
+        for name, state in states.items():
+            if name in by_name:
+                by_name[name].merge(merged[name], state)
+    return merged
+
+
+def render(states):
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render(states.get(metric.name, {})))
+    return "\n".join(lines) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop("query_started", None)
+    if started is not None and has_request_context() and "sql_stats" in g:
+        g.sql_stats[0] += 1
+        g.sql_stats[1] += time.perf_counter() - started
+
+
+def _after_transaction_create(session, transaction):
+    # An autobegun transaction exists before its connection is checked out
+    if transaction.parent is None:
+        session.info["connection_wanted"] = time.perf_counter()
+
+
+def _after_begin(session, transaction, connection):
+    wanted = session.info.pop("connection_wanted", None)
+    if wanted is not None:
+        POOL_WAIT_SECONDS.observe(time.perf_counter() - wanted)
+
+
+def _pool_event(name, level=logging.DEBUG):
+    def listener(dbapi_connection, *args):
+        POOL_EVENTS.inc(name)
+        if logger.isEnabledFor(level):
+            error = args[-1] if name == "invalidate" and args else None
+            logger.log(level, f"Database pool {name} ({id(dbapi_connection):#x})" + (f": {error}" if error else ""))
+    return listener
+
+
+POOL_LISTENERS = {
+    "connect": _pool_event("connect"),
+    "checkout": _pool_event("checkout"),
+    "checkin": _pool_event("checkin"),
+    "invalidate": _pool_event("invalidate", logging.WARNING),
+    "soft_invalidate": _pool_event("soft_invalidate", logging.INFO),
+    "close": _pool_event("close"),
+}
+
+
+def init_app(app):
+    """Time every request and count its SQL; recording is a dict update under a lock.
+
+    Each gunicorn worker keeps its own numbers. With METRICS_DIR set, every
+    worker also dumps them there every METRICS_DUMP_INTERVAL seconds and
+    /metrics adds up all the workers' files.
+    """
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    directory = app.config.get("METRICS_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    interval = app.config.get("METRICS_DUMP_INTERVAL", 5)
+    last_dump = [0.0]
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Session, "after_transaction_create", _after_transaction_create)
+        event.listen(Session, "after_begin", _after_begin)
+        for name, listener in POOL_LISTENERS.items():
+            event.listen(Pool, name, listener)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_stats = [0, 0.0]
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method,
+                                f"{response.status_code // 100}xx")
+        queries, sql_seconds = g.pop("sql_stats", (0, 0.0))
+        REQUEST_SQL_QUERIES.observe(queries, endpoint)
+        REQUEST_SQL_SECONDS.observe(sql_seconds, endpoint)
+        if directory and time.monotonic() - last_dump[0] >= interval:
+            last_dump[0] = time.monotonic()
+            dump(directory)
+        return response
@@ -1,25 +1,136 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from app.replica import RoutingSession
+
+# SELECTs in views marked @read_only may go to the "replica" bind, see app.replica
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def dialect_insert(table):
+    """INSERT for ``table`` with ON CONFLICT support (PostgreSQL in production, SQLite locally)."""
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
 
 class Contact(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     Name = db.Column(db.String(100))
-    Email = db.Column(db.String(120))
+    Email = db.Column(db.String(120), index=True)
     Number = db.Column(db.String(20))
     Message = db.Column(db.Text)
 
+    # Admin contact search is a prefix LIKE on lower(Email)
+    __table_args__ = (
+        db.Index("ix_contact_email_lower", db.func.lower(Email).label("email_lower"),
+                 postgresql_ops={"email_lower": "varchar_pattern_ops"}),
+    )
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)  # Hashed Password
 
+class Plan(db.Model):
+    id = db.Column(db.String(30), primary_key=True)  # Stable slug, e.g. "silver_monthly"
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Integer, nullable=False)  # In rupees
+    period = db.Column(db.String(10), nullable=False)  # "month" or "year"
+    description = db.Column(db.Text)  # Shown on the plan card, may contain HTML
+    popular = db.Column(db.Boolean, default=False)
+    active = db.Column(db.Boolean, default=True)
+    sort_order = db.Column(db.Integer, default=0)
+    full_day = db.Column(db.Boolean, default=False)  # Holds a seat in every shift
+
+class Shift(db.Model):
+    id = db.Column(db.String(20), primary_key=True)  # e.g. "morning"
+    name = db.Column(db.String(100), nullable=False)
+    starts_at = db.Column(db.Time, nullable=False)
+    ends_at = db.Column(db.Time, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)  # Seats available in this shift
+    active = db.Column(db.Boolean, default=True)
+    sort_order = db.Column(db.Integer, default=0)
+
+class SlotInventory(db.Model):
+    """Seats booked per (date, shift); allocation only ever bumps ``booked`` while it is below ``capacity``."""
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    shift_id = db.Column(db.String(20), db.ForeignKey("shift.id"), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    booked = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("date", "shift_id", name="uq_slot_inventory_date_shift"),
+        db.CheckConstraint("booked >= 0 AND booked <= capacity", name="ck_slot_inventory_booked"),
+    )
+
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    email = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=False, index=True)
     phone = db.Column(db.String(20), nullable=False)
-    plan = db.Column(db.String(50), nullable=False)
-    start_date = db.Column(db.String(20), nullable=False)
-    paid = db.Column(db.Boolean, default=False)
-    razorpay_order_id = db.Column(db.String(100))  # Store Razorpay order ID
+    # NULL only for legacy rows whose free-text plan matched no catalog plan
+    plan_id = db.Column(db.String(30), db.ForeignKey("plan.id"), index=True)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date)  # Last day of the plan period
+    shift_id = db.Column(db.String(20), db.ForeignKey("shift.id"))  # NULL for full-day plans
+    # True while this booking's seats are counted in SlotInventory
+    seat_held = db.Column(db.Boolean, nullable=False, default=False)
+    paid = db.Column(db.Boolean, default=False, index=True)
+    paid_at = db.Column(db.DateTime)  # NULL for bookings paid before it was recorded
+    razorpay_order_id = db.Column(db.String(100), unique=True, index=True)  # Store Razorpay order ID
+    amount = db.Column(db.Integer)  # In paise
+    # pending -> processing -> created | failed (gateway order lifecycle);
+    # "expired" once the reconciler gives up on an unpaid booking
+    status = db.Column(db.String(20), default="pending", nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # When the standalone worker moved the row to "processing"
+    claimed_at = db.Column(db.DateTime)
+    # Issued with book.html so a repeated POST maps back to the same booking
+    idempotency_key = db.Column(db.String(64), unique=True, index=True)
+
+    # Admin dashboard filters on paid/start_date, pages by (start_date, id) and
+    # searches by prefix LIKE on lower(email); varchar_pattern_ops lets PostgreSQL
+    # use the index for LIKE whatever the database collation
+    __table_args__ = (
+        db.Index("ix_booking_start_date_id", "start_date", "id"),
+        db.Index("ix_booking_paid_start_date", "paid", "start_date"),
+        db.Index("ix_booking_email_lower", db.func.lower(email).label("email_lower"),
+                 postgresql_ops={"email_lower": "varchar_pattern_ops"}),
+    )
+
+class PaymentEvent(db.Model):
+    """Append-only log of payment notifications (webhooks and checkout redirects).
+
+    Rows are written as fast as possible by the request and applied to
+    Booking later, in batches, by the payment event consumer.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(100), unique=True, nullable=False)  # Dedupes gateway retries
+    event_type = db.Column(db.String(50), nullable=False)
+    order_id = db.Column(db.String(100), index=True)
+    payment_id = db.Column(db.String(100))
+    payload = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, index=True)
+
+class AdminAudit(db.Model):
+    """One row per admin bulk action: who did what to how many records."""
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    user_email = db.Column(db.String(150))
+    record_type = db.Column(db.String(20), nullable=False)  # "booking" or "contact"
+    action = db.Column(db.String(20), nullable=False)  # "delete", "mark_paid", "expire"
+    criteria = db.Column(db.Text)  # JSON: the selected ids or the filters applied
+    affected = db.Column(db.Integer, nullable=False)
+
+class DailyRollup(db.Model):
+    """Booking and payment totals per (day, plan), kept up to date by app.analytics."""
+    date = db.Column(db.Date, primary_key=True)
+    plan_id = db.Column(db.String(30), primary_key=True)  # "" for bookings without a catalog plan
+    bookings = db.Column(db.Integer, nullable=False, default=0)  # Made that day (created_at)
+    paid = db.Column(db.Integer, nullable=False, default=0)  # Paid that day (paid_at)
+    revenue = db.Column(db.BigInteger, nullable=False, default=0)  # In paise, paid that day
+    active_members = db.Column(db.Integer, nullable=False, default=0)  # Paid bookings covering the day
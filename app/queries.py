@@ -0,0 +1,118 @@
+from datetime import date
+
+from app.models import Booking, Contact, db
+
+ADMIN_PAGE_SIZE = 50
+
+# sort key -> (column, descending)
+BOOKING_SORTS = {
+    "newest": (Booking.id, True),
+    "oldest": (Booking.id, False),
+    "start_date": (Booking.start_date, False),
+    "-start_date": (Booking.start_date, True),
+}
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _prefix_pattern(value):
+    """LIKE pattern matching values that start with ``value``, with its wildcards escaped."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def booking_filters(args):
+    """Build the WHERE clauses for the admin booking list from request args."""
+    clauses = []
+
+    paid = args.get("paid")
+    if paid == "yes":
+        clauses.append(Booking.paid.is_(True))
+    elif paid == "no":
+        clauses.append(db.or_(Booking.paid.is_(False), Booking.paid.is_(None)))
+    elif paid == "no_seat":
+        clauses.append(Booking.status == "needs_seat")
+
+    plan = args.get("plan")
+    if plan:
+        clauses.append(Booking.plan_id == plan)
+
+    date_from = _parse_date(args.get("date_from"))
+    if date_from:
+        clauses.append(Booking.start_date >= date_from)
+    date_to = _parse_date(args.get("date_to"))
+    if date_to:
+        clauses.append(Booking.start_date <= date_to)
+
+    email = (args.get("email") or "").strip().lower()
+    if email:
+        # Prefix match on lower(email): served by ix_booking_email_lower (varchar_pattern_ops on PostgreSQL)
+        clauses.append(db.func.lower(Booking.email).like(_prefix_pattern(email), escape="\\"))
+
+    return clauses
+
+
+# Request args read by contact_filters; the admin page keeps them apart from the booking filters
+CONTACT_FILTER_KEYS = ("contact_email",)
+
+
+def contact_filters(args):
+    clauses = []
+    email = (args.get("contact_email") or "").strip().lower()
+    if email:
+        clauses.append(db.func.lower(Contact.Email).like(_prefix_pattern(email), escape="\\"))
+    return clauses
+
+
+def _encode_cursor(value, row_id):
+    return f"{value}|{row_id}"
+
+
+def _decode_cursor(cursor, sort_column):
+    value, _, row_id = (cursor or "").rpartition("|")
+    try:
+        if sort_column.type.python_type is date:
+            value = date.fromisoformat(value)
+        return value, int(row_id)
+    except ValueError:
+        return None
+
+
+def keyset_page(model, clauses, sort_column, descending, after=None, limit=ADMIN_PAGE_SIZE):
+    """Return one page of rows plus the cursor for the next page.
+
+    Rows are ordered by (sort_column, id) so the cursor is stable even when
+    the sort column has duplicates. Each page costs at most ``limit + 1`` rows
+    however large the table is.
+    """
+    query = db.session.query(model).filter(*clauses)
+    pk = model.id
+
+    decoded = _decode_cursor(after, sort_column)
+    if decoded:
+        value, last_id = decoded
+        if sort_column is pk:
+            query = query.filter(pk < last_id if descending else pk > last_id)
+        elif descending:
+            query = query.filter(db.or_(sort_column < value,
+                                        db.and_(sort_column == value, pk < last_id)))
+        else:
+            query = query.filter(db.or_(sort_column > value,
+                                        db.and_(sort_column == value, pk > last_id)))
+
+    if sort_column is pk:
+        order = [pk.desc() if descending else pk.asc()]
+    else:
+        order = [sort_column.desc(), pk.desc()] if descending else [sort_column.asc(), pk.asc()]
+
+    rows = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_column.key), last.id)
+    return rows, next_cursor
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens=1.0):
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1.0):
+        """Block until ``tokens`` are available."""
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class KeyedRateLimiter:
+    """One :class:`TokenBucket` per key (e.g. client IP), kept in this process.
+
+    At most ``max_keys`` buckets are kept; the least recently used are
+    dropped, which only ever makes a client's limit more lenient.
+    """
+
+    def __init__(self, rate, capacity=None, max_keys=10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+        return bucket.try_acquire()
+
+
+# Token bucket refilled and spent atomically on the Redis server
+_REDIS_BUCKET = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, capacity, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local updated = tonumber(state[2]) or now
+local tokens = math.min(capacity, (tonumber(state[1]) or capacity) + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return allowed
+"""
+
+
+class RedisRateLimiter:
+    """Per-key token buckets shared by every worker; needs the optional ``redis`` package."""
+
+    def __init__(self, url, rate, capacity=None, prefix="satva:ratelimit:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("A redis rate limit store needs the 'redis' package installed")
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_BUCKET)
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.prefix = prefix
+
+    def allow(self, key):
+        return bool(self._script(keys=[self.prefix + key], args=[self.rate, self.capacity, time.time()]))
@@ -1,46 +1,260 @@
 import os
+import time
+import uuid
+import random
 import logging
+import threading
 import razorpay
+import razorpay.errors
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import ConnectionError, RequestException
 from dotenv import load_dotenv
 
+from app.metrics import GATEWAY_REJECTED, GATEWAY_RETRIES, GATEWAY_SECONDS
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Errors worth retrying and counting against the circuit breaker.
+# BadRequestError means our request was wrong, so retrying cannot help.
+RETRYABLE_ERRORS = (ConnectionError, RequestException,
+                    razorpay.errors.ServerError, razorpay.errors.GatewayError)
+
+
 class DummyRazorpayClient:
     class DummyOrder:
-        def create(self, data):
+        def create(self, data, **kwargs):
             logger.warning("Using dummy Razorpay client - payment functionality disabled")
-            return {"id": "dummy_order_id", "amount": data["amount"], "currency": data["currency"]}
+            return {"id": f"dummy_order_{uuid.uuid4().hex[:14]}", "amount": data["amount"], "currency": data["currency"]}
 
     class DummyUtility:
         def verify_payment_signature(self, params):
             logger.warning("Signature verification skipped - using dummy client")
 
+        def verify_webhook_signature(self, body, signature, secret):
+            logger.warning("Webhook signature verification skipped - using dummy client")
+
     def __init__(self):
         self.order = self.DummyOrder()
         self.utility = self.DummyUtility()
 
 
-def get_razorpay_client():
+class CircuitOpenError(Exception):
+    """Raised instead of calling the gateway while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open single probe -> closed."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probe_in_flight:
+                # Let exactly one request through to test the gateway
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Payment gateway circuit closed")
+            self.state = "closed"
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error)
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"Payment gateway circuit opened after {self.failures} failures: {error}")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 1))
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_in_seconds": retry_in,
+                "last_error": self.last_error,
+            }
+
+
+class ResilientRazorpayClient:
+    """Wraps a Razorpay client with one retry/backoff/circuit-breaker layer.
+
+    ``client.order.create(...)`` and every other resource call go through
+    :meth:`call`. ``utility`` is passed through untouched since signature
+    checks are local HMACs and never hit the network.
+    """
+
+    class _Resource:
+        def __init__(self, resource, owner):
+            self._resource = resource
+            self._owner = owner
+
+        def __getattr__(self, name):
+            method = getattr(self._resource, name)
+
+            def wrapped(*args, **kwargs):
+                return self._owner.call(method, *args, **kwargs)
+            return wrapped
+
+    def __init__(self, client, breaker=None, max_attempts=3, base_delay=0.2,
+                 max_delay=2.0, deadline=8.0, connect_timeout=3.05, read_timeout=5.0):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.order = self._Resource(client.order, self)
+        self.utility = client.utility
+
+    def __getattr__(self, name):
+        # payment, refund, ... resources not wrapped explicitly above
+        return self._Resource(getattr(self.client, name), self)
+
+    def call(self, fn, *args, deadline=None, **kwargs):
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        last_error = None
+        # e.g. "order.create", for the metrics
+        operation = f"{type(getattr(fn, '__self__', None)).__name__.lower()}.{getattr(fn, '__name__', 'call')}"
+
+        for attempt in range(self.max_attempts):
+            if not self.breaker.allow_request():
+                GATEWAY_REJECTED.inc(operation)
+                raise CircuitOpenError("Payment gateway circuit is open")
+
+            remaining = deadline_at - time.monotonic()
+            kwargs["timeout"] = (self.connect_timeout, min(self.read_timeout, max(remaining, 0.1)))
+            started = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                GATEWAY_SECONDS.observe(time.monotonic() - started, operation, "retryable_error")
+                last_error = e
+                self.breaker.record_failure(e)
+                logger.warning(f"Gateway call failed (attempt {attempt + 1}/{self.max_attempts}): {e}")
+            except razorpay.errors.BadRequestError:
+                # The gateway answered; the request itself was bad
+                GATEWAY_SECONDS.observe(time.monotonic() - started, operation, "bad_request")
+                self.breaker.record_success()
+                raise
+            except Exception as e:
+                GATEWAY_SECONDS.observe(time.monotonic() - started, operation, "error")
+                self.breaker.record_failure(e)
+                raise
+            else:
+                GATEWAY_SECONDS.observe(time.monotonic() - started, operation, "ok")
+                self.breaker.record_success()
+                return result
+
+            # Full jitter: sleep somewhere in [0, base * 2^attempt], within the deadline
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+            if attempt == self.max_attempts - 1 or time.monotonic() + delay >= deadline_at:
+                break
+            GATEWAY_RETRIES.inc(operation)
+            time.sleep(delay)
+
+        raise last_error
+
+
+def build_gateway_session(pool_size):
+    """A keep-alive session whose pool is shared by every gateway call in this process.
+
+    Retries are handled by ResilientRazorpayClient, so the adapter never retries.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                          max_retries=0, pool_block=False)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def gateway_pool_size():
+    """One connection per thread that can talk to the gateway in this process."""
+    if os.environ.get("GATEWAY_POOL_SIZE"):
+        return int(os.environ["GATEWAY_POOL_SIZE"])
+    web_threads = int(os.environ.get("GUNICORN_THREADS", 1))
+    queue_threads = int(os.environ.get("ORDER_QUEUE_THREADS", 2))
+    return web_threads + queue_threads
+
+
+def build_razorpay_client():
     key_id = os.environ.get("KEY_ID")
     key_secret = os.environ.get("KEY_SECRET")
 
     if not key_id or not key_secret:
         logger.error("Razorpay credentials not found in environment variables")
-        return DummyRazorpayClient()
+        client = DummyRazorpayClient()
+    else:
+        options = {}
+        if os.environ.get("RAZORPAY_BASE_URL"):
+            # e.g. a local stub gateway for benchmarks
+            options["base_url"] = os.environ["RAZORPAY_BASE_URL"]
+        client = razorpay.Client(session=build_gateway_session(gateway_pool_size()),
+                                 auth=(key_id, key_secret), **options)
 
-    # Create a requests session with retry logic
-    requests_session = requests.Session()
-    for adapter in requests_session.adapters.values():
-        adapter.max_retries = 3
+    breaker = CircuitBreaker(
+        failure_threshold=int(os.environ.get("GATEWAY_FAILURE_THRESHOLD", 5)),
+        reset_timeout=float(os.environ.get("GATEWAY_RESET_TIMEOUT", 30)),
+    )
+    return ResilientRazorpayClient(
+        client,
+        breaker=breaker,
+        max_attempts=int(os.environ.get("GATEWAY_MAX_ATTEMPTS", 3)),
+        deadline=float(os.environ.get("GATEWAY_DEADLINE", 8)),
+        connect_timeout=float(os.environ.get("GATEWAY_CONNECT_TIMEOUT", 3.05)),
+        read_timeout=float(os.environ.get("GATEWAY_READ_TIMEOUT", 5)),
+    )
 
-    client = razorpay.Client(auth=(key_id, key_secret))
-    # Optionally set custom session or transports if needed here
 
-    return client
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_razorpay_client():
+    """The process-wide gateway client, built on first use rather than at import.
+
+    Building it opens no connections, but doing it lazily keeps worker boot
+    cheap and means a client is never inherited across a gunicorn fork.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_razorpay_client()
+    return _client
 
 
-# Create a reusable Razorpay client instance
-razorpay_client = get_razorpay_client()
+def reset_razorpay_client():
+    """Drop the cached client (and its pooled sockets), e.g. in a freshly forked worker."""
+    global _client
+    with _client_lock:
+        _client = None
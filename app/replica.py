@@ -0,0 +1,116 @@
+import logging
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import Select
+
+from app.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND = "replica"
+# Flask session key holding when this visitor last committed a write
+LAST_WRITE_KEY = "_last_write"
+
+READ_ROUTING = Counter("satva_db_read_routing_total",
+                       "SELECTs in read-only views, by the database they were sent to.", ("target",))
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+REPLICA_LAG_SQL = {
+    "postgresql": text("SELECT COALESCE(CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                       "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END, 0)"),
+}
+
+# Per process: the replica is skipped until this time.monotonic() value
+_replica_down_until = 0.0
+
+
+def mark_replica_down(seconds, reason):
+    global _replica_down_until
+    logger.warning(f"Read replica skipped for {seconds}s: {reason}")
+    _replica_down_until = time.monotonic() + seconds
+
+
+def replica_available():
+    return time.monotonic() >= _replica_down_until
+
+
+def check_replica(engine):
+    """One round trip to the replica; marks it down if unreachable or lagging too far."""
+    config = current_app.config
+    try:
+        with engine.connect() as conn:
+            lag = conn.execute(REPLICA_LAG_SQL.get(engine.dialect.name, text("SELECT 0"))).scalar() or 0
+    except DBAPIError as e:
+        mark_replica_down(config.get("REPLICA_RETRY_AFTER", 30), e.orig or e)
+        return False
+    if lag > config.get("REPLICA_MAX_LAG", 10):
+        mark_replica_down(config.get("REPLICA_RETRY_AFTER", 30), f"{lag:.1f}s behind the primary")
+        return False
+    return True
+
+
+def read_only(view):
+    """Mark a view as read-only: its SELECTs may be served by the read replica."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Sends SELECTs from read-only views to the replica bind, everything else to the primary.
+
+    A read goes to the primary instead when no replica is configured, when
+    the replica failed its once-per-request check (unreachable, or more than
+    REPLICA_MAX_LAG seconds behind) in this or a recent request, inside a
+    flush, or within READ_YOUR_WRITES_SECONDS of a write committed by the
+    same visitor (tracked in their Flask session), so someone who just
+    changed something always sees the change.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and has_request_context() and g.get("read_only"):
+            engines = self._db.engines
+            if REPLICA_BIND in engines and self._replica_ok(engines[REPLICA_BIND]):
+                READ_ROUTING.inc("replica")
+                return engines[REPLICA_BIND]
+            READ_ROUTING.inc("primary")
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _replica_ok(self, engine):
+        if self._flushing or self.info.get("wrote") or not replica_available():
+            return False
+        window = current_app.config.get("READ_YOUR_WRITES_SECONDS", 5)
+        if time.time() - flask_session.get(LAST_WRITE_KEY, 0) <= window:
+            return False
+        if "replica_ok" not in g:
+            g.replica_ok = check_replica(engine)
+        return g.replica_ok
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _after_commit(session):
+    if session.info.pop("wrote", False) and has_request_context() and REPLICA_BIND in session._db.engines:
+        flask_session[LAST_WRITE_KEY] = time.time()
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("wrote", None)
@@ -1,8 +1,19 @@
+from datetime import date, timedelta
 from flask import Blueprint, render_template, request, redirect, session, flash
+from flask import Response, jsonify, stream_with_context
 from app.models import User
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.security import (HashPoolBusy, check_password, hash_password, lockout_remaining,
+                          needs_rehash, record_failure, record_success)
+from app.replica import read_only
 from app.utils import admin_required, logger
-from app.models import db,Contact,Booking
+from app.models import db,Contact,Booking,Plan
+from app.catalog import get_plans, invalidate_catalog
+from app.analytics import ANALYTICS_DAYS, analytics_summary
+from app.bulk import BULK_ACTIONS, BULK_MAX_IDS, bulk_apply
+from app.cache import clear_page_cache
+from app.export import EXPORT_FORMATS, export_rows
+from app.queries import (BOOKING_SORTS, CONTACT_FILTER_KEYS, booking_filters, contact_filters,
+                         keyset_page)
 from flask import abort,url_for
 
 
@@ -11,26 +22,39 @@ auth_bp = Blueprint('auth', __name__)
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
     error = None
+    status = 200
     if request.method == "POST":
         try:
             email = request.form["email"].strip()
             password = request.form["password"].strip()
 
+            locked = lockout_remaining(email, request.remote_addr)
+            if locked:
+                return render_template("login.html", error=f"Too many failed attempts. Try again in {locked} seconds."), 429
+
             user = User.query.filter_by(email=email).first()
 
-            if user and check_password_hash(user.password, password):
+            if check_password(user.password if user else None, password):
+                record_success(email)
+                if needs_rehash(user.password):
+                    user.password = hash_password(password)
+                    db.session.commit()
                 session["user_id"] = user.id
                 session["user_email"] = user.email
                 flash("Login successful", "success")
                 return redirect("/admin")
             else:
+                record_failure(email, request.remote_addr)
                 error = "Invalid email or password"
 
+        except HashPoolBusy:
+            error = "The server is busy. Please try again in a moment."
+            status = 503
         except Exception as e:
             logger.error(f"Login error: {e}")
             error = "An error occurred during login. Please try again."
 
-    return render_template("login.html", error=error)
+    return render_template("login.html", error=error), status
 
 @auth_bp.route("/logout")
 def logout():
@@ -42,6 +66,7 @@ def logout():
 def update_password():
     error = None
     success = None
+    status = 200
 
     if request.method == "POST":
         try:
@@ -50,29 +75,41 @@ def update_password():
             new_password = request.form["new_password"].strip()
             confirm_password = request.form["confirm_password"].strip()
 
+            locked = lockout_remaining(email, request.remote_addr)
+            if locked:
+                error = f"Too many failed attempts. Try again in {locked} seconds."
+                return render_template("update_password.html", error=error, success=success), 429
+
             user = User.query.filter_by(email=email).first()
 
             if not user:
+                record_failure(email, request.remote_addr)
                 error = "Email not found."
-            elif not check_password_hash(user.password, current_password):
+            elif not check_password(user.password, current_password):
+                record_failure(email, request.remote_addr)
                 error = "Current password is incorrect."
             elif new_password != confirm_password:
                 error = "New passwords do not match."
             else:
-                user.password = generate_password_hash(new_password)
+                record_success(email)
+                user.password = hash_password(new_password)
                 db.session.commit()
                 success = "Password updated successfully"
                 flash(success, "success")
                 return redirect("/login")
 
+        except HashPoolBusy:
+            error = "The server is busy. Please try again in a moment."
+            status = 503
         except Exception as e:
             logger.error(f"Password update error: {e}")
             error = "An error occurred while updating your password. Please try again."
 
-    return render_template("update_password.html", error=error, success=success)
+    return render_template("update_password.html", error=error, success=success), status
 
 #DELETE ROUTE
 @auth_bp.route('/delete/<string:record_type>/<int:id>', methods=["GET", "POST"])
+@admin_required
 def delete(record_type, id):
     if record_type == "contact":
         record = Contact.query.get_or_404(id)
@@ -81,22 +118,163 @@ def delete(record_type, id):
     else:
         abort(404)
     if request.method == "POST":
-        db.session.delete(record)
-        db.session.commit()
+        model = Contact if record_type == "contact" else Booking
+        bulk_apply(record_type, "delete", [model.id == id], {"ids": [id]}, session.get("user_email"))
         flash(f"{record_type.capitalize()} deleted successfully!", "success")
         return redirect(url_for('auth.admin'))  # Blueprint name . route name
     return render_template("delete_contact.html", record=record, type=record_type)
 
 
+@auth_bp.route("/admin/bulk/<string:record_type>", methods=["POST"])
+@admin_required
+def admin_bulk(record_type):
+    """Apply delete/mark_paid/expire to the selected ids or to everything the filters match.
+
+    Accepts the admin page form (redirects back with a flash) or a JSON body
+    ``{"action": ..., "ids": [...]}`` / ``{"action": ..., "filters": {...}}``
+    (answers with the affected count).
+    """
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        ids, filters = data.get("ids"), data.get("filters")
+    else:
+        data = request.form
+        ids = request.form.getlist("ids") if request.form.get("scope") != "filtered" else None
+        filters = None if ids is not None else request.form
+    model = Booking if record_type == "booking" else Contact
+    action = data.get("action")
+
+    def respond(message, category, status=200, **result):
+        if request.is_json:
+            return jsonify(message=message, **result), status
+        flash(message, category)
+        kept = {k: v for k, v in request.form.items() if v and k not in ("action", "scope", "ids")}
+        return redirect(url_for('auth.admin', **kept))
+
+    if action not in BULK_ACTIONS.get(record_type, ()):
+        abort(404 if record_type not in BULK_ACTIONS else 400)
+
+    if ids is not None:
+        try:
+            ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            return respond("Invalid selection.", "danger", 400)
+        if not ids:
+            return respond("Nothing selected.", "warning", 400)
+        if len(ids) > BULK_MAX_IDS:
+            return respond(f"Select at most {BULK_MAX_IDS} records at a time.", "danger", 400)
+        clauses, criteria = [model.id.in_(ids)], {"ids": ids}
+    else:
+        filters = filters or {}
+        clauses = booking_filters(filters) if record_type == "booking" else contact_filters(filters)
+        # An empty filter would hit the whole table
+        if not clauses:
+            return respond("Set a filter before applying an action to all matches.", "warning", 400)
+        criteria = {"filters": {k: v for k, v in filters.items() if v and k not in ("action", "scope")}}
+
+    try:
+        affected = bulk_apply(record_type, action, clauses, criteria, session.get("user_email"))
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Bulk {action} on {record_type} failed: {e}")
+        return respond("The bulk action failed, nothing was changed.", "danger", 500)
+    return respond(f"{action.replace('_', ' ').capitalize()}: {affected} {record_type}(s) affected.",
+                   "success", action=action, affected=affected)
+
 
 @auth_bp.route("/admin")
 @admin_required
+@read_only
 def admin():
     try:
-        all_contacts = Contact.query.all()
-        all_booking = Booking.query.all()
-        return render_template("admin.html", contacts=all_contacts, booking=all_booking)
+        sort = request.args.get("sort", "newest")
+        if sort not in BOOKING_SORTS:
+            sort = "newest"
+        sort_column, descending = BOOKING_SORTS[sort]
+
+        bookings, next_booking = keyset_page(
+            Booking, booking_filters(request.args), sort_column, descending,
+            after=request.args.get("after"))
+        contacts, next_contact = keyset_page(
+            Contact, contact_filters(request.args), Contact.id, True,
+            after=request.args.get("contacts_after"))
+
+        # Keep the active filters when following a "next page" link
+        filters = {k: v for k, v in request.args.items()
+                   if v and k not in ("after", "contacts_after")}
+        contact_filter_args = {k: v for k, v in filters.items() if k in CONTACT_FILTER_KEYS}
+
+        return render_template("admin.html", contacts=contacts, booking=bookings,
+                               next_booking=next_booking, next_contact=next_contact,
+                               filters=filters, contact_filters=contact_filter_args,
+                               sort=sort, sorts=BOOKING_SORTS,
+                               plans=get_plans(include_inactive=True))
     except Exception as e:
         logger.error(f"Admin page error: {e}")
         flash("An error occurred while loading the admin page.", "danger")
         return redirect("/")
+
+
+@auth_bp.route("/admin/export/<string:record_type>.<string:fmt>")
+@admin_required
+@read_only
+def admin_export(record_type, fmt):
+    """Stream bookings or contacts matching the admin filters as CSV or JSONL."""
+    if record_type == "booking":
+        clauses = booking_filters(request.args)
+    elif record_type == "contact":
+        clauses = contact_filters(request.args)
+    else:
+        abort(404)
+    if fmt not in EXPORT_FORMATS:
+        abort(404)
+    logger.info(f"Export of {record_type} as {fmt} by {session.get('user_email')}")
+    filename = f"{record_type}s-{date.today().isoformat()}.{fmt}"
+    return Response(stream_with_context(export_rows(record_type, clauses, fmt)),
+                    content_type=EXPORT_FORMATS[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={filename}",
+                             "X-Accel-Buffering": "no"})
+
+
+@auth_bp.route("/admin/analytics")
+@admin_required
+@read_only
+def admin_analytics():
+    """Bookings, conversions, revenue and active members per day and plan, from the daily rollups."""
+    try:
+        end = date.fromisoformat(request.args["end"]) if request.args.get("end") else date.today()
+        start = (date.fromisoformat(request.args["start"]) if request.args.get("start")
+                 else end - timedelta(days=ANALYTICS_DAYS - 1))
+    except ValueError:
+        flash("Invalid date.", "danger")
+        return redirect(url_for('auth.admin_analytics'))
+    if start > end:
+        start, end = end, start
+    return render_template("admin_analytics.html", summary=analytics_summary(start, end))
+
+
+@auth_bp.route("/admin/plans", methods=["GET", "POST"])
+@admin_required
+def admin_plans():
+    if request.method == "POST":
+        plan_id = request.form.get("id")
+        if not plan_id:
+            abort(400)
+        plan = Plan.query.get_or_404(plan_id)
+        try:
+            plan.name = request.form.get("name", plan.name).strip()
+            plan.price = int(request.form.get("price", plan.price))
+            plan.description = request.form.get("description", "")
+            plan.popular = "popular" in request.form
+            plan.active = "active" in request.form
+            plan.full_day = "full_day" in request.form
+            db.session.commit()
+            invalidate_catalog()
+            clear_page_cache()
+            flash(f"Plan {plan.id} updated", "success")
+        except ValueError:
+            db.session.rollback()
+            flash("Price must be a whole number of rupees.", "danger")
+        return redirect(url_for('auth.admin_plans'))
+
+    return render_template("admin_plans.html", plans=get_plans(include_inactive=True))
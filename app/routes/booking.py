@@ -1,16 +1,58 @@
-from flask import Blueprint, render_template, request, session, flash, redirect
-from app.models import Booking, db
-from app.razorpay_client import razorpay_client
-from requests.exceptions import ConnectionError, RequestException
-import time
+from flask import Blueprint, render_template, request, session, flash, redirect, jsonify, abort, current_app
+from app.models import Booking, PaymentEvent, db
+from app.tasks import enqueue_order, notify_payment_events
+from app.utils import render_booking_form
+from app.analytics import record_booking
+from app.catalog import get_plan
+from app.inventory import (AVAILABILITY_DAYS, BOOKING_HORIZON_DAYS, allocate, availability_changed, booking_shifts,
+                           cached_availability, ensure_inventory, get_shifts, plan_end_date, reclaim)
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import hmac
+import json
 import logging
-import razorpay.errors
+from datetime import date, timedelta
 import os
+import uuid
 
 
 booking_bp = Blueprint('booking', __name__)
 logger = logging.getLogger(__name__)
 
+def render_checkout(booking):
+    # Only this browser may poll the status of its booking
+    session['booking_id'] = booking.id
+    return render_template("payment_checkout.html",
+                           razorpay_key_id=os.environ.get("KEY_ID"),
+                           amount=booking.amount,
+                           name=booking.name,
+                           email=booking.email,
+                           phone=booking.phone,
+                           booking_id=booking.id)
+
+
+def replay_booking(booking):
+    """Answer a repeated submission from the booking it already created."""
+    logger.info(f"Duplicate submission for booking {booking.id}, returning existing checkout")
+    if booking.status == "failed":
+        # Give a failed order another go instead of creating a new booking;
+        # its seats were given back when it failed, so take them again first
+        if not reclaim(booking.id):
+            db.session.rollback()
+            flash("No seats left in that shift for those dates. Please pick another shift or start date.", "warning")
+            return render_booking_form()
+        retried = (Booking.query
+                   .filter_by(id=booking.id, status="failed")
+                   .update({"status": "pending"}, synchronize_session=False))
+        if retried:
+            db.session.commit()
+            availability_changed()
+            enqueue_order(booking.id)
+        else:
+            db.session.rollback()
+    return render_checkout(booking)
+
+
 @booking_bp.route("/payment_checkout", methods=["GET", "POST"])
 def submit_booking():
     if request.method == "POST":
@@ -19,90 +61,164 @@ def submit_booking():
             email = request.form["email"]
             phone = request.form["phone"]
             plan = request.form["plan"]
-            start_date = request.form["start_date"]
+            start_date = date.fromisoformat(request.form["start_date"])
+            idempotency_key = request.form.get("idempotency_key", "").strip()[:64] or uuid.uuid4().hex
+
+            existing = Booking.query.filter_by(idempotency_key=idempotency_key).first()
+            if existing:
+                return replay_booking(existing)
+
+            catalog_plan = get_plan(plan)
+            if catalog_plan is None or not catalog_plan.active:
+                flash("Invalid plan selected. Please try again.", "danger")
+                return render_booking_form()
+            amount = catalog_plan.amount
+
+            shift_id = None
+            if not catalog_plan.full_day:
+                shift_id = request.form.get("shift")
+                if shift_id not in {s.id for s in get_shifts()}:
+                    flash("Please choose a shift.", "danger")
+                    return render_booking_form()
+            if start_date < date.today():
+                flash("Start date cannot be in the past.", "danger")
+                return render_booking_form()
+            horizon = current_app.config.get("BOOKING_HORIZON_DAYS", BOOKING_HORIZON_DAYS)
+            if start_date > date.today() + timedelta(days=horizon):
+                flash(f"Bookings open at most {horizon} days ahead.", "danger")
+                return render_booking_form()
+            end_date = plan_end_date(catalog_plan.period, start_date)
+            shift_ids = booking_shifts(catalog_plan.full_day, shift_id)
+            ensure_inventory(shift_ids, start_date, end_date)
 
-            # Save to database
+            # Save to database, in one transaction with the inventory rows and seats; the gateway order is created in the background
             new_booking = Booking(
                 name=name,
                 email=email,
                 phone=phone,
-                plan=plan,
-                start_date=start_date
+                plan_id=catalog_plan.id,
+                start_date=start_date,
+                end_date=end_date,
+                shift_id=shift_id,
+                seat_held=True,
+                amount=amount,
+                status="pending",
+                idempotency_key=idempotency_key
             )
             db.session.add(new_booking)
-            db.session.commit()
-
-            plan_amount_map = {
-                "सिल्वर प्लान ₹400/महीना": 40000,
-                "गोल्ड प्लान ₹1000/महीना": 100000,
-                "सिल्वर वार्षिक ₹4000/वर्ष": 400000,
-                "गोल्ड वार्षिक ₹10,000/वर्ष": 1000000
-            }
-            amount = plan_amount_map.get(plan, 0)
-
-            if amount == 0:
-                flash("Invalid plan selected. Please try again.", "danger")
-                return render_template("book.html")
-
-            max_retries = 3
-            razorpay_key_id=os.environ.get("KEY_ID")  # load from .env
-            
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Attempting to create Razorpay order (attempt {attempt + 1})")
-                    razorpay_order = razorpay_client.order.create({
-                        "amount": amount,
-                        "currency": "INR",
-                        "receipt": f"booking_{new_booking.id}",
-                        "payment_capture": '1'
-                    })
-                    logger.info("Razorpay order created successfully")
-                    break
-
-                except (ConnectionError, RequestException) as e:
-                    logger.warning(f"Connection error on attempt {attempt + 1}: {e}")
-                    if attempt == max_retries - 1:
-                        flash("Payment gateway is temporarily unavailable. Please try again in a moment.", "danger")
-                        db.session.delete(new_booking)
-                        db.session.commit()
-                        return render_template("book.html")
-                    time.sleep(1)
-
-                except razorpay.errors.BadRequestError as e:
-                    logger.error(f"Razorpay BadRequestError: {e}")
-                    flash("Invalid request to payment gateway. Please check your details and try again.", "danger")
-                    db.session.delete(new_booking)
+            try:
+                # Seats and booking are committed together or not at all
+                allocated = allocate(shift_ids, start_date, end_date)
+                if allocated:
+                    record_booking(new_booking)
                     db.session.commit()
-                    return render_template("book.html")
+            except IntegrityError:
+                # A concurrent request with the same key won the insert
+                db.session.rollback()
+                existing = Booking.query.filter_by(idempotency_key=idempotency_key).first()
+                if existing is None:
+                    raise
+                return replay_booking(existing)
+            if not allocated:
+                db.session.rollback()
+                flash("No seats left in that shift for those dates. Please pick another shift or start date.", "warning")
+                return render_booking_form()
+            availability_changed()
 
-                except Exception as e:
-                    logger.error(f"Unexpected error creating Razorpay order: {e}")
-                    flash("An unexpected error occurred. Please try again.", "danger")
-                    db.session.delete(new_booking)
-                    db.session.commit()
-                    return render_template("book.html")
-
-            # Update booking with Razorpay order ID
-            new_booking.razorpay_order_id = razorpay_order['id']
-            db.session.commit()
-
-            # Save order id in session and render checkout template
-            session['razorpay_order_id'] = razorpay_order['id']
-            return render_template("payment_checkout.html",
-                                   razorpay_order_id=razorpay_order['id'],
-                                   razorpay_key_id=os.environ.get("KEY_ID"),
-                                   amount=amount,
-                                   name=name,
-                                   email=email,
-                                   phone=phone,
-                                   booking_id=new_booking.id)
+            enqueue_order(new_booking.id)
+            return render_checkout(new_booking)
 
         except Exception as e:
             logger.error(f"Error in submit_booking: {e}")
             flash("An error occurred while processing your request. Please try again.", "danger")
-            return render_template("book.html")
+            return render_booking_form()
+
+    return render_booking_form()
+
+@booking_bp.route("/payment_status/<int:booking_id>")
+def payment_status(booking_id):
+    """Polled by the checkout page until the gateway order id is ready."""
+    if session.get('booking_id') != booking_id:
+        abort(404)
+
+    booking = db.session.get(Booking, booking_id)
+    if booking is None:
+        abort(404)
+
+    if booking.status == "created":
+        session['razorpay_order_id'] = booking.razorpay_order_id
+    return jsonify({
+        "status": booking.status,
+        "razorpay_order_id": booking.razorpay_order_id if booking.status == "created" else None
+    })
+
+@booking_bp.route("/api/availability")
+def availability_api():
+    """Seats left per shift and day: ?from=YYYY-MM-DD (today up to the booking horizon)&days=N (1-62)."""
+    try:
+        start = date.fromisoformat(request.args["from"]) if request.args.get("from") else None
+        days = min(max(int(request.args.get("days", AVAILABILITY_DAYS)), 1), 62)
+    except (ValueError, OverflowError):
+        abort(400)
+    today = date.today()
+    horizon = timedelta(days=current_app.config["BOOKING_HORIZON_DAYS"])
+    if start is not None and not today <= start <= today + horizon:
+        abort(400)
+    response = jsonify(cached_availability(start, days))
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config.get("AVAILABILITY_CACHE_TTL", 15)
+    return response
+
+def record_payment_event(event_id, event_type, order_id, payment_id, payload):
+    """Append an event to the payment log; duplicates of a known event are ignored."""
+    db.session.add(PaymentEvent(event_id=event_id, event_type=event_type, order_id=order_id,
+                                payment_id=payment_id, payload=payload))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        logger.info(f"Payment event {event_id} already recorded")
+        return False
+    notify_payment_events()
+    return True
+
+
+def signature_valid(message, signature, secret):
+    """Check a Razorpay HMAC-SHA256 signature ourselves, whatever gateway client is configured."""
+    expected = hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or "")
+
+
+@booking_bp.route("/razorpay/webhook", methods=["POST"])
+def razorpay_webhook():
+    """Verify and log a Razorpay webhook; bookings are updated by the event consumer."""
+    secret = os.environ.get("RAZORPAY_WEBHOOK_SECRET")
+    if not secret:
+        logger.error("RAZORPAY_WEBHOOK_SECRET is not set, rejecting webhook")
+        return "Webhook not configured", 503
+
+    raw_body = request.get_data()
+    if not signature_valid(raw_body, request.headers.get("X-Razorpay-Signature"), secret):
+        logger.warning("Rejected webhook with an invalid signature")
+        return "Invalid signature", 400
+    body = raw_body.decode("utf-8", "replace")
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return "Invalid payload", 400
+
+    event_type = data.get("event", "")
+    payload = data.get("payload", {})
+    entity = (payload.get("payment") or payload.get("order") or {}).get("entity", {})
+    order_id = entity.get("order_id") or (entity.get("id") if entity.get("entity") == "order" else None)
+    payment_id = entity.get("id") if entity.get("entity") == "payment" else None
+    # Razorpay resends the same X-Razorpay-Event-Id when it retries a delivery
+    event_id = request.headers.get("X-Razorpay-Event-Id") or f"{event_type}:{payment_id or order_id}"
+
+    record_payment_event(event_id, event_type, order_id, payment_id, body)
+    return "", 200
 
-    return render_template("book.html")
 
 @booking_bp.route("/payment_success", methods=["GET", "POST"])
 def payment_success():
@@ -115,25 +231,29 @@ def payment_success():
             logger.error("Missing payment details in callback")
             return "Missing payment details", 400
 
-        params_dict = {
-            "razorpay_order_id": order_id,
-            "razorpay_payment_id": payment_id,
-            "razorpay_signature": signature
-        }
-        razorpay_client.utility.verify_payment_signature(params_dict)
+        # Not through the gateway client: its dummy stand-in accepts anything
+        key_secret = os.environ.get("KEY_SECRET")
+        if not key_secret:
+            logger.error("KEY_SECRET is not set, cannot verify the payment callback")
+            return "Payments not configured", 503
+        if not signature_valid(f"{order_id}|{payment_id}".encode(), signature, key_secret):
+            logger.warning(f"Rejected payment callback with an invalid signature for order {order_id}")
+            return "Invalid signature", 400
         logger.info("Payment signature verified successfully")
 
-        booking = Booking.query.filter_by(razorpay_order_id=order_id).first()
-        if booking:
-            booking.paid = True
-            db.session.commit()
-            logger.info(f"Booking {booking.id} marked as paid")
-        else:
+        # The verified redirect is logged like a webhook so the booking is
+        # marked paid even if the webhook never arrives
+        record_payment_event(f"checkout:{payment_id}", "checkout.success", order_id, payment_id, None)
+
+        booking_id = (db.session.query(Booking.id)
+                      .filter_by(razorpay_order_id=order_id)
+                      .scalar())
+        if booking_id is None:
             logger.warning(f"No booking found for order ID: {order_id}")
 
         return render_template("payment_success.html",
                                payment_id=payment_id,
-                               booking_id=booking.id if booking else None)
+                               booking_id=booking_id)
 
     except Exception as e:
         logger.error(f"Error in payment_success: {e}")
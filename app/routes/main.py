@@ -1,28 +1,46 @@
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, request, abort
+from app.contacts import submit_contact
+from app.utils import render_booking_form
+from app.catalog import get_plans
+from app.cache import cached_page
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route("/")
 @main_bp.route("/home")
+@cached_page()
 def home():
     return render_template("home.html")
 
 @main_bp.route("/about")
+@cached_page()
 def about():
     return render_template("about.html")
 
 @main_bp.route("/gallery")
+@cached_page()
 def gallery():
     return render_template("gallery.html")
 
 @main_bp.route("/contact")
+@cached_page()
 def contact():
     return render_template("contact.html")
 
+@main_bp.route("/submit", methods=["POST"])
+def submit():
+    if not all(request.form.get(f, "").strip() for f in ("name", "email", "message")):
+        abort(400, description="Name, email and message are required")
+    if submit_contact(request.form, request.remote_addr) == "limited":
+        abort(429, description="Too many messages, please try again in a few minutes")
+    return render_template("submit.html", name=request.form["name"], email=request.form["email"],
+                           number=request.form.get("number", ""), message=request.form["message"])
+
 @main_bp.route("/plans")
+@cached_page()
 def plan():
-    return render_template("plan.html")
+    return render_template("plan.html", plans=get_plans())
 
 @main_bp.route("/book")
 def book():
-    return render_template("book.html")
+    return render_booking_form()
@@ -1,68 +1,67 @@
-from flask import Blueprint, jsonify, request, render_template, flash, redirect, url_for, abort
-from app.models import Contact, Booking, db
-from app.utils import logger
-import socket
-import requests
+import hmac
+from flask import Blueprint, jsonify, request, current_app, abort
+from app import metrics
+from app.health import get_sampler, readiness
+from app.razorpay_client import get_razorpay_client
 
 misc_bp = Blueprint('misc', __name__)
 
 @misc_bp.route("/network_test")
 def network_test():
-    results = {}
+    """Gateway DNS/HTTP reachability as last sampled in the background."""
+    sample = get_sampler().latest()
+    if sample is None or "gateway" not in sample:
+        return jsonify({"status": "no sample yet"}), 503
+    return jsonify({**sample["gateway"], "sampled_at": sample["sampled_at"]})
 
-    # Test DNS resolution
-    try:
-        razorpay_ip = socket.gethostbyname('api.razorpay.com')
-        results['dns'] = f"Success: {razorpay_ip}"
-    except socket.gaierror as e:
-        results['dns'] = f"Failed: {e}"
-
-    # Test HTTP connection
-    try:
-        response = requests.get('https://api.razorpay.com', timeout=10)
-        results['http'] = f"Success: Status {response.status_code}"
-    except requests.exceptions.RequestException as e:
-        results['http'] = f"Failed: {e}"
+@misc_bp.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint; needs METRICS_TOKEN unless METRICS_PUBLIC is set."""
+    config = current_app.config
+    token = config.get("METRICS_TOKEN")
+    if not config.get("METRICS_ENABLED", True) or not (token or config.get("METRICS_PUBLIC")):
+        abort(404)
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        abort(401)
+    body = metrics.render(metrics.collect(current_app.config.get("METRICS_DIR")))
+    return body, 200, {"Content-Type": metrics.CONTENT_TYPE}
 
-    # Test Razorpay API connectivity (without auth)
-    try:
-        test_response = requests.get('https://api.razorpay.com/v1/orders', timeout=10)
-        results['razorpay'] = f"Connectivity: Status {test_response.status_code}"
-    except requests.exceptions.RequestException as e:
-        results['razorpay'] = f"Failed: {e}"
+@misc_bp.route("/livez")
+def liveness():
+    """The process is up and serving requests; says nothing about dependencies."""
+    return jsonify({"status": "alive"})
 
-    return jsonify(results)
+@misc_bp.route("/readyz")
+def readiness_check():
+    """Whether this worker should get traffic, from the last background health sample."""
+    ready, reason = readiness(get_sampler().latest(), current_app.config.get("HEALTH_INTERVAL", 15),
+                              current_app.config.get("HEALTH_MAX_POOL_SATURATION", 1.0))
+    return jsonify({"status": "ready" if ready else "not ready", "reason": reason}), 200 if ready else 503
 
 @misc_bp.route("/health")
 def health_check():
-    try:
-        db.session.execute("SELECT 1")
-        db_status = "OK"
-    except Exception as e:
-        db_status = f"Error: {str(e)}"
+    sample = get_sampler().latest()
+    ready, reason = readiness(sample, current_app.config.get("HEALTH_INTERVAL", 15),
+                              current_app.config.get("HEALTH_MAX_POOL_SATURATION", 1.0))
 
     from os import environ
     razorpay_configured = bool(environ.get("KEY_ID") and environ.get("KEY_SECRET"))
 
+    if sample is None:
+        db_status = "Not checked yet"
+    elif sample["database"]["ok"]:
+        db_status = "OK"
+    else:
+        db_status = f"Error: {sample['database']['error']}"
+
     return jsonify({
-        "status": "healthy",
+        "status": "healthy" if ready else "degraded",
+        "reason": reason,
         "database": db_status,
-        "razorpay_configured": razorpay_configured
+        "pool": sample["pool"] if sample else None,
+        "replica": sample.get("replica") if sample else None,
+        "db_profile": current_app.config.get("DB_PROFILE"),
+        "sampled_at": sample["sampled_at"] if sample else None,
+        "razorpay_configured": razorpay_configured,
+        "payment_gateway": get_razorpay_client().breaker.snapshot()
     })
-
-@misc_bp.route('/delete/<string:record_type>/<int:id>', methods=["GET", "POST"])
-def delete(record_type, id):
-    if record_type == "contact":
-        record = Contact.query.get_or_404(id)
-    elif record_type == "booking":
-        record = Booking.query.get_or_404(id)
-    else:
-        abort(404)
-
-    if request.method == "POST":
-        db.session.delete(record)
-        db.session.commit()
-        flash(f"{record_type.capitalize()} deleted successfully!", "success")
-        return redirect(url_for('auth.admin'))  # Assuming 'auth.admin' is your admin page blueprint route
-
-    return render_template("delete_contact.html", record=record, type=record_type)
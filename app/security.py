@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from app.cache import LRUCache, RedisCache
+from app.models import db
+
+logger = logging.getLogger(__name__)
+
+
+class HashPoolBusy(Exception):
+    """No hashing slot came free in time; the caller should answer 503."""
+
+
+class HashPool:
+    """Caps how many password hashes run at once on this machine, across all workers.
+
+    Each hash holds one of ``slots`` lock files in ``directory`` (an flock,
+    which the OS drops if the worker dies). gunicorn workers are separate
+    processes, so a per-process cap would let a login burst take every
+    worker; with fewer slots than workers some are always left for bookings.
+    A worker waiting for a slot is tied up too, so a call that finds none
+    free for ``wait`` seconds raises :class:`HashPoolBusy` instead of queueing.
+    Without fcntl (Windows) the cap is per process.
+    """
+
+    def __init__(self, slots=1, wait=0.5, directory=None):
+        self.slots = slots
+        self.wait = wait
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "satva-hash-slots")
+        if fcntl is None:
+            self._semaphore = threading.BoundedSemaphore(slots)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _try_slot(self):
+        for slot in range(self.slots):
+            fd = os.open(os.path.join(self.directory, f"slot-{slot}"), os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        return None
+
+    def _acquire(self):
+        if fcntl is None:
+            return self._semaphore.acquire(timeout=self.wait) or None
+        deadline = time.monotonic() + self.wait
+        while True:
+            fd = self._try_slot()
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            time.sleep(0.01)
+
+    def run(self, fn, *args):
+        fd = self._acquire()
+        if fd is None:
+            raise HashPoolBusy()
+        try:
+            return fn(*args)
+        finally:
+            if fcntl is None:
+                self._semaphore.release()
+            else:
+                os.close(fd)
+
+
+def _pool():
+    return current_app.extensions["hash_pool"]
+
+
+def _dummy_hash():
+    # Checked against when the account doesn't exist, so both cases cost the same
+    dummy = current_app.extensions.get("dummy_password_hash")
+    if dummy is None:
+        dummy = current_app.extensions["dummy_password_hash"] = hash_password("not-a-password")
+    return dummy
+
+
+def hash_password(password):
+    return _pool().run(generate_password_hash, password, current_app.config["PASSWORD_HASH_METHOD"])
+
+
+def check_password(stored_hash, password):
+    """Check a password on the hash pool; ``stored_hash`` may be None for unknown accounts.
+
+    Ends the caller's transaction first, so a request waiting for a hash
+    slot doesn't also hold a pooled database connection.
+    """
+    db.session.rollback()
+    if stored_hash is None:
+        _pool().run(check_password_hash, _dummy_hash(), password)
+        return False
+    return _pool().run(check_password_hash, stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    """True if the hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    return not stored_hash.startswith(current_app.config["PASSWORD_HASH_METHOD"] + "$")
+
+
+def _throttle_key(kind, value):
+    return f"login:{kind}:{hashlib.sha1(value.strip().lower().encode()).hexdigest()}"
+
+
+def _lockout(failures, free_attempts):
+    # Exponential: base, 2x base, 4x base, ... after the free attempts, capped
+    if failures <= free_attempts:
+        return 0
+    config = current_app.config
+    return min(config["LOGIN_LOCKOUT_BASE"] * 2 ** (failures - free_attempts - 1), config["LOGIN_LOCKOUT_MAX"])
+
+
+def _limits(email, ip):
+    config = current_app.config
+    return [(_throttle_key("account", email), config["LOGIN_FREE_ATTEMPTS"]),
+            (_throttle_key("ip", ip or ""), config["LOGIN_FREE_ATTEMPTS_PER_IP"])]
+
+
+def create_login_store(config):
+    """Where failed-login counts are kept: only the login views write to it.
+
+    "memory" keeps up to LOGIN_THROTTLE_MAX_KEYS counts in each worker;
+    "redis" shares them between workers at RESPONSE_CACHE_REDIS_URL, under
+    a prefix the page cache never clears.
+    """
+    if config.get("LOGIN_THROTTLE_STORE", "memory") == "redis":
+        return RedisCache(config.get("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"),
+                          prefix="satva-login:")
+    return LRUCache(config.get("LOGIN_THROTTLE_MAX_KEYS", 10000))
+
+
+def _store():
+    return current_app.extensions["login_throttle"]
+
+
+def lockout_remaining(email, ip):
+    """Seconds until this account and address may try again (0 if they may now)."""
+    store = _store()
+    now = time.time()
+    remaining = 0
+    for key, _ in _limits(email, ip):
+        state = store.get(key)
+        if state:
+            remaining = max(remaining, state["locked_until"] - now)
+    return int(remaining + 0.999)
+
+
+def record_failure(email, ip):
+    """Count a failed attempt against the account and the address."""
+    store = _store()
+    now = time.time()
+    for key, free_attempts in _limits(email, ip):
+        state = store.get(key) or {"failures": 0, "locked_until": 0}
+        state["failures"] += 1
+        lock = _lockout(state["failures"], free_attempts)
+        state["locked_until"] = now + lock
+        store.set(key, state, current_app.config["LOGIN_FAILURE_WINDOW"] + lock)
+    logger.warning(f"Failed login for {email} from {ip}")
+
+
+def record_success(email):
+    # Only the account is cleared; a correct password doesn't clear the address
+    _store().delete(_throttle_key("account", email))
+
+
+def init_app(app):
+    app.extensions["hash_pool"] = HashPool(app.config.get("PASSWORD_HASH_WORKERS", 1),
+                                           app.config.get("PASSWORD_HASH_WAIT", 0.5),
+                                           app.config.get("PASSWORD_HASH_LOCK_DIR"))
+    app.extensions["login_throttle"] = create_login_store(app.config)
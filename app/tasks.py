@@ -0,0 +1,313 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+import razorpay.errors
+
+from app.analytics import mark_paid
+from app.inventory import availability_changed, release
+from app.models import Booking, PaymentEvent, db
+from app.razorpay_client import CircuitOpenError, get_razorpay_client
+
+logger = logging.getLogger(__name__)
+
+# Event types that prove an order has been paid
+PAID_EVENTS = ("payment.captured", "order.paid", "checkout.success")
+
+
+def claim_booking(booking_id):
+    """Atomically move a booking from pending to processing.
+
+    Every consumer claims a row before calling the gateway, so the in-process
+    queue and the standalone worker's sweep never both create an order for
+    it. The claim costs one commit, in the background thread rather than the
+    request. The claim time lets :func:`release_stale_claims` hand the row
+    back if the consumer dies during the gateway call.
+    """
+    claimed = (Booking.query
+               .filter_by(id=booking_id, status="pending")
+               .update({"status": "processing", "claimed_at": datetime.utcnow()}, synchronize_session=False))
+    db.session.commit()
+    return claimed == 1
+
+
+def release_stale_claims(timeout):
+    """Put bookings claimed more than ``timeout`` seconds ago back to pending; returns how many."""
+    released = (Booking.query
+                .filter(Booking.status == "processing",
+                        db.or_(Booking.claimed_at.is_(None),
+                               Booking.claimed_at < datetime.utcnow() - timedelta(seconds=timeout)))
+                .update({"status": "pending", "claimed_at": None}, synchronize_session=False))
+    db.session.commit()
+    if released:
+        logger.warning(f"Returned {released} bookings stuck in processing to pending")
+    return released
+
+
+def request_gateway_order(booking_id, amount):
+    """Ask the gateway for an order; returns (status, order_id) without writing."""
+    try:
+        logger.info(f"Creating Razorpay order for booking {booking_id}")
+        # Retries, backoff and the circuit breaker live in the client wrapper
+        razorpay_order = get_razorpay_client().order.create({
+            "amount": amount,
+            "currency": "INR",
+            "receipt": f"booking_{booking_id}",
+            "payment_capture": '1'
+        })
+        logger.info(f"Razorpay order created for booking {booking_id}")
+        return "created", razorpay_order['id']
+
+    except CircuitOpenError:
+        logger.warning(f"Payment gateway circuit open, failing booking {booking_id} fast")
+
+    except razorpay.errors.BadRequestError as e:
+        logger.error(f"Razorpay BadRequestError for booking {booking_id}: {e}")
+
+    except Exception as e:
+        logger.error(f"Error creating Razorpay order for booking {booking_id}: {e}")
+
+    return "failed", None
+
+
+def create_gateway_order(booking_id, claim=False):
+    """Create the Razorpay order for a booking and record it in one commit.
+
+    The result is written with a conditional UPDATE, so a row that another
+    consumer already finished is never overwritten. A failed gateway call
+    marks the row failed and gives its seats back in the same commit;
+    nothing is inserted and then deleted.
+    """
+    booking = db.session.get(Booking, booking_id)
+    if booking is None or booking.status != "pending":
+        return
+    amount = booking.amount
+    if claim and not claim_booking(booking_id):
+        return
+    # Don't keep a transaction open while waiting on the gateway
+    db.session.rollback()
+
+    status, order_id = request_gateway_order(booking_id, amount)
+    finished = (Booking.query
+                .filter_by(id=booking_id, status="processing" if claim else "pending")
+                .update({"status": status, "razorpay_order_id": order_id},
+                        synchronize_session=False))
+    # A failed order keeps no seats: retrying the form must not use up another one
+    released = bool(finished) and status == "failed" and release(booking_id)
+    db.session.commit()
+    if released:
+        availability_changed()
+    if not finished:
+        logger.warning(f"Booking {booking_id} was finished by another consumer")
+
+
+class OrderQueue:
+    """In-process queue of booking ids drained by a few daemon threads.
+
+    Threads are started lazily on the first enqueue, i.e. after gunicorn has
+    forked the worker, so nothing is shared across processes.
+    """
+
+    def __init__(self, app, num_threads=2):
+        self.app = app
+        self.num_threads = num_threads
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.num_threads):
+                t = threading.Thread(target=self._run, name=f"order-queue-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _run(self):
+        while True:
+            booking_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    # Claimed, so a sweep of a backed-up queue can't order it a second time
+                    create_gateway_order(booking_id, claim=True)
+            except Exception as e:
+                logger.error(f"Order job for booking {booking_id} crashed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def enqueue(self, booking_id):
+        self._start()
+        self._queue.put(booking_id)
+
+    def join(self):
+        """Block until every queued booking has been processed."""
+        self._queue.join()
+
+
+def enqueue_order(booking_id):
+    from flask import current_app
+
+    order_queue = current_app.extensions.get("order_queue")
+    if order_queue is not None:
+        order_queue.enqueue(booking_id)
+    # Without an in-process queue the standalone worker picks the row up
+
+
+def apply_payment_events(batch_size=200):
+    """Apply one batch of unprocessed payment events to their bookings.
+
+    The whole batch costs one UPDATE on Booking (via the razorpay_order_id
+    index), one upsert of the daily rollups, one UPDATE on the event log and
+    a single commit. On PostgreSQL
+    concurrent consumers skip each other's locked rows. Returns the number
+    of events handled.
+    """
+    events = (PaymentEvent.query
+              .filter(PaymentEvent.processed_at.is_(None))
+              .order_by(PaymentEvent.id)
+              .limit(batch_size)
+              .with_for_update(skip_locked=True)
+              .all())
+    if not events:
+        db.session.rollback()
+        return 0
+
+    paid_orders = {e.order_id for e in events if e.event_type in PAID_EVENTS and e.order_id}
+    updated = 0
+    if paid_orders:
+        updated = mark_paid(Booking.razorpay_order_id.in_(paid_orders))
+    (PaymentEvent.query
+     .filter(PaymentEvent.id.in_([e.id for e in events]))
+     .update({"processed_at": datetime.utcnow()}, synchronize_session=False))
+    db.session.commit()
+
+    logger.info(f"Applied {len(events)} payment events, {updated} bookings marked paid")
+    return len(events)
+
+
+class PaymentEventConsumer:
+    """Background thread that drains the payment event log when notified.
+
+    It also wakes up every ``poll_interval`` seconds, so events written by
+    another process are picked up even without a notification.
+    """
+
+    def __init__(self, app, poll_interval=5.0):
+        self.app = app
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def notify(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="payment-events", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    while apply_payment_events():
+                        pass
+            except Exception as e:
+                logger.error(f"Payment event consumer failed: {e}")
+
+
+def notify_payment_events():
+    from flask import current_app
+
+    consumer = current_app.extensions.get("payment_consumer")
+    if consumer is not None:
+        consumer.notify()
+    # Without an in-process consumer the standalone worker applies the events
+
+
+def run_worker(app, poll_interval=1.0):
+    """Standalone worker loop: create orders for pending bookings and apply payment events.
+
+    In "thread" mode the web workers handle their own bookings, so this only
+    sweeps rows still pending after ORDER_SWEEP_AFTER seconds (e.g. the web
+    process died before its queue drained). Rows a worker claimed but never
+    finished (it died during the gateway call) go back to pending after
+    ORDER_CLAIM_TIMEOUT seconds. Reconciliation and the seat recount run
+    every RECONCILE_INTERVAL and RECOUNT_INTERVAL seconds.
+    """
+    logger.info("Order worker started")
+    reconcile_interval = app.config.get("RECONCILE_INTERVAL", 0)
+    recount_interval = app.config.get("RECOUNT_INTERVAL", 0)
+    last_reconcile = last_recount = time.monotonic()
+    while True:
+        with app.app_context():
+            try:
+                release_stale_claims(app.config.get("ORDER_CLAIM_TIMEOUT", 120))
+                cutoff = datetime.utcnow() - timedelta(seconds=app.config.get("ORDER_SWEEP_AFTER", 0))
+                pending = [b.id for b in (Booking.query
+                                          .filter(Booking.status == "pending",
+                                                  Booking.created_at <= cutoff)
+                                          .order_by(Booking.id)
+                                          .limit(50))]
+                for booking_id in pending:
+                    create_gateway_order(booking_id, claim=True)
+                applied = apply_payment_events()
+                if reconcile_interval and time.monotonic() - last_reconcile >= reconcile_interval:
+                    run_reconciliation(app)
+                    last_reconcile = time.monotonic()
+                if recount_interval and time.monotonic() - last_recount >= recount_interval:
+                    run_recount()
+                    last_recount = time.monotonic()
+            except Exception as e:
+                # One failed pass (database down, gateway error) must not stop the worker
+                logger.error(f"Order worker pass failed: {e}")
+                db.session.rollback()
+                pending, applied = [], 0
+        if not pending and not applied:
+            time.sleep(poll_interval)
+
+
+def run_reconciliation(app):
+    from app.reconcile import reconcile_unpaid
+
+    try:
+        hold = timedelta(seconds=app.config.get("SEAT_HOLD_TTL", 900))
+        return reconcile_unpaid(stale_after=hold, expire_after=hold,
+                                concurrency=app.config.get("RECONCILE_CONCURRENCY", 4),
+                                rate=app.config.get("RECONCILE_RATE", 10.0))
+    except Exception as e:
+        logger.error(f"Reconciliation failed: {e}")
+        db.session.rollback()
+
+
+def run_recount():
+    from app.inventory import recount_inventory
+
+    try:
+        return recount_inventory()
+    except Exception as e:
+        logger.error(f"Inventory recount failed: {e}")
+        db.session.rollback()
+
+
+def init_app(app):
+    if app.config.get("ORDER_QUEUE_MODE", "thread") == "thread":
+        app.extensions["order_queue"] = OrderQueue(app, app.config.get("ORDER_QUEUE_THREADS", 2))
+        app.extensions["payment_consumer"] = PaymentEventConsumer(app)
+
+    @app.cli.command("order-worker")
+    def order_worker():
+        """Create gateway orders and apply payment events (run as a separate process)."""
+        run_worker(app)
+
+    @app.cli.command("reconcile-payments")
+    def reconcile_payments():
+        """Check stale unpaid bookings against the gateway (for cron/scheduler)."""
+        stats = run_reconciliation(app)
+        if stats:
+            print(" ".join(f"{k}={v}" for k, v in stats.items()))
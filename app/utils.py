@@ -1,6 +1,7 @@
 import logging
+import uuid
 from functools import wraps
-from flask import session, flash, redirect
+from flask import session, flash, redirect, render_template
 
 # Configure logging for your app (adjust level as needed)
 logging.basicConfig(level=logging.INFO)
@@ -15,3 +16,22 @@ def admin_required(f):
             return redirect("/login")
         return f(*args, **kwargs)
     return decorated_function
+
+IDEMPOTENCY_PLACEHOLDER = "__idempotency_key__"
+AVAILABILITY_PLACEHOLDER = "__availability__"
+
+def render_booking_form():
+    """Render book.html with a fresh idempotency key and live seat availability.
+
+    The form itself is cached; only the key and the availability table are
+    filled in per request.
+    """
+    from app.cache import cached_fragment
+    from app.catalog import get_plans
+    from app.inventory import cached_availability, get_shifts
+    html = cached_fragment("book.html", lambda: render_template(
+        "book.html", idempotency_key=IDEMPOTENCY_PLACEHOLDER, availability=AVAILABILITY_PLACEHOLDER,
+        plans=get_plans(), shifts=get_shifts()))
+    table = render_template("availability.html", availability=cached_availability())
+    return (html.replace(IDEMPOTENCY_PLACEHOLDER, uuid.uuid4().hex)
+                .replace(AVAILABILITY_PLACEHOLDER, table))
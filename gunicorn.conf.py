@@ -0,0 +1,31 @@
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+# Import the app once in the master and fork workers from it, so each worker
+# boots without re-importing Flask, SQLAlchemy and the routes
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def post_fork(server, worker):
+    if server.cfg.preload_app:
+        from app import reset_after_fork
+
+        reset_after_fork(server.app.wsgi())
+
+
+def on_starting(server):
+    # Dumps left by the workers of a previous run would be added to the new ones
+    if os.environ.get("METRICS_DIR"):
+        from app.metrics import remove_dumps
+
+        remove_dumps(os.environ["METRICS_DIR"])
+
+
+def child_exit(server, worker):
+    if os.environ.get("METRICS_DIR"):
+        from app.metrics import remove_dumps
+
+        remove_dumps(os.environ["METRICS_DIR"], worker.pid)
@@ -0,0 +1,56 @@
+"""Baseline schema, as db.create_all() built it before migrations existed
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+
+Databases created by the old create_all() startup already have these
+tables: run ``flask db stamp 0001_baseline`` once, then ``flask db upgrade``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'contact',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('Name', sa.String(length=100), nullable=True),
+        sa.Column('Email', sa.String(length=120), nullable=True),
+        sa.Column('Number', sa.String(length=20), nullable=True),
+        sa.Column('Message', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(length=150), nullable=False),
+        sa.Column('password', sa.String(length=200), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    op.create_table(
+        'booking',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=False),
+        sa.Column('plan', sa.String(length=50), nullable=False),
+        sa.Column('start_date', sa.String(length=20), nullable=False),
+        sa.Column('paid', sa.Boolean(), nullable=True),
+        sa.Column('razorpay_order_id', sa.String(length=100), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade():
+    op.drop_table('booking')
+    op.drop_table('user')
+    op.drop_table('contact')
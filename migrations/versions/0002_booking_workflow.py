@@ -0,0 +1,112 @@
+"""Booking workflow columns, plan catalog and payment event log
+
+Revision ID: 0002_booking_workflow
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:00
+
+Adds what the checkout queue, idempotent submits, the plan catalog and the
+webhook log introduced on top of the baseline. Existing bookings get an
+amount from their plan id or label and a terminal status: "created" when they
+already have a gateway order, "failed" otherwise.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_booking_workflow'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+# The plan catalog as this revision seeded it, kept here so later catalog edits can't rewrite history
+PERIOD_LABELS = {'month': 'महीना', 'year': 'वर्ष'}
+DEFAULT_PLANS = [
+    dict(id="silver_monthly", name="सिल्वर प्लान", price=400, period="month", sort_order=1,
+         description='प्रत्येक दिन <strong>4 घंटे</strong> की सुविधा <br>("सुबह 6 बजे से रात 10 बजे तक किसी भी समय")'),
+    dict(id="gold_monthly", name="गोल्ड प्लान", price=1000, period="month", sort_order=2, popular=True,
+         description='<strong>अनलिमिटेड एक्सेस</strong> ("सुबह 6 बजे से रात 10 बजे तक, हर दिन")<br>'),
+    dict(id="silver_annual", name="सिल्वर वार्षिक", price=4000, period="year", sort_order=3,
+         description='2 महीने<strong>नि:शुल्क</strong><br>हर दिन 4 घंटे की सुविधा'),
+    dict(id="gold_annual", name="गोल्ड वार्षिक", price=10000, period="year", sort_order=4,
+         description='2 महीने <strong>नि:शुल्क</strong><br>पूरा दिन अनलिमिटेड एक्सेस'),
+]
+
+booking = sa.table(
+    'booking',
+    sa.column('plan', sa.String),
+    sa.column('razorpay_order_id', sa.String),
+    sa.column('amount', sa.Integer),
+    sa.column('status', sa.String),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _table_exists(name):
+    # Tables added to the models were created by create_all() on older installs
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    op.add_column('booking', sa.Column('amount', sa.Integer(), nullable=True))
+    op.add_column('booking', sa.Column('status', sa.String(length=20), nullable=False,
+                                       server_default='pending'))
+    op.add_column('booking', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.add_column('booking', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+
+    amounts = []
+    for plan in DEFAULT_PLANS:
+        period = PERIOD_LABELS[plan['period']]
+        for key in {plan['id'], f"{plan['name']} ₹{plan['price']}/{period}",
+                    f"{plan['name']} ₹{plan['price']:,}/{period}"}:
+            amounts.append((booking.c.plan == key, plan['price'] * 100))
+    op.execute(booking.update().values(
+        amount=sa.case(*amounts, else_=None),
+        status=sa.case((booking.c.razorpay_order_id.isnot(None), 'created'), else_='failed'),
+        created_at=sa.func.current_timestamp(),
+    ))
+
+    if not _table_exists('plan'):
+        plan_table = op.create_table(
+            'plan',
+            sa.Column('id', sa.String(length=30), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('price', sa.Integer(), nullable=False),
+            sa.Column('period', sa.String(length=10), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('popular', sa.Boolean(), nullable=True),
+            sa.Column('active', sa.Boolean(), nullable=True),
+            sa.Column('sort_order', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.bulk_insert(plan_table, [{'popular': False, 'active': True, **plan}
+                                    for plan in DEFAULT_PLANS])
+
+    if not _table_exists('payment_event'):
+        op.create_table(
+            'payment_event',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('event_id', sa.String(length=100), nullable=False),
+            sa.Column('event_type', sa.String(length=50), nullable=False),
+            sa.Column('order_id', sa.String(length=100), nullable=True),
+            sa.Column('payment_id', sa.String(length=100), nullable=True),
+            sa.Column('payload', sa.Text(), nullable=True),
+            sa.Column('received_at', sa.DateTime(), nullable=True),
+            sa.Column('processed_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('event_id'),
+        )
+        op.create_index('ix_payment_event_order_id', 'payment_event', ['order_id'])
+        op.create_index('ix_payment_event_processed_at', 'payment_event', ['processed_at'])
+
+
+def downgrade():
+    op.drop_table('payment_event')
+    op.drop_table('plan')
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_column('idempotency_key')
+        batch_op.drop_column('created_at')
+        batch_op.drop_column('status')
+        batch_op.drop_column('amount')
@@ -0,0 +1,192 @@
+"""Typed booking columns and lookup indexes
+
+Revision ID: 0003_typed_booking
+Revises: 0002_booking_workflow
+Create Date: 2026-10-18 09:30:00
+
+booking.start_date becomes a real DATE and the free-text booking.plan is
+replaced by booking.plan_id, a foreign key to the plan catalog. Email,
+paid, status, gateway order id and idempotency key get indexes, the last
+two unique, along with the (start_date, id) and (paid, start_date)
+indexes the admin dashboard pages over.
+
+Online, existing rows are converted in id-range batches that commit one
+by one, so a large table is never locked for the whole backfill. Offline
+(``flask db upgrade --sql``) the backfill is a single UPDATE. Indexes are
+built CONCURRENTLY on PostgreSQL.
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_typed_booking'
+down_revision = '0002_booking_workflow'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH = 5000
+
+# Plans (and their label spellings) that booking.plan could hold before this revision
+PERIOD_LABELS = {'month': 'महीना', 'year': 'वर्ष'}
+DEFAULT_PLANS = [
+    dict(id='silver_monthly', name='सिल्वर प्लान', price=400, period='month'),
+    dict(id='gold_monthly', name='गोल्ड प्लान', price=1000, period='month'),
+    dict(id='silver_annual', name='सिल्वर वार्षिक', price=4000, period='year'),
+    dict(id='gold_annual', name='गोल्ड वार्षिक', price=10000, period='year'),
+]
+
+booking = sa.table(
+    'booking',
+    sa.column('id', sa.Integer),
+    sa.column('plan', sa.String),
+    sa.column('plan_id', sa.String),
+    sa.column('start_date', sa.String),
+    sa.column('start_on', sa.Date),
+    sa.column('created_at', sa.DateTime),
+    sa.column('razorpay_order_id', sa.String),
+    sa.column('status', sa.String),
+)
+
+# Booking as 0002 left it, for SQLite table rebuilds when no database is connected
+legacy_booking = sa.Table(
+    'booking', sa.MetaData(),
+    sa.Column('id', sa.Integer(), primary_key=True),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=False),
+    sa.Column('plan', sa.String(length=50), nullable=False),
+    sa.Column('start_date', sa.String(length=20), nullable=False),
+    sa.Column('paid', sa.Boolean(), nullable=True),
+    sa.Column('razorpay_order_id', sa.String(length=100), nullable=True),
+    sa.Column('amount', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=True),
+    sa.Column('start_on', sa.Date(), nullable=True),
+    sa.Column('plan_id', sa.String(length=30), nullable=True),
+)
+
+BOOKING_INDEXES = [
+    ('ix_booking_email', ['email'], False),
+    ('ix_booking_plan_id', ['plan_id'], False),
+    ('ix_booking_paid', ['paid'], False),
+    ('ix_booking_status', ['status'], False),
+    ('ix_booking_razorpay_order_id', ['razorpay_order_id'], True),
+    ('ix_booking_idempotency_key', ['idempotency_key'], True),
+    ('ix_booking_start_date_id', ['start_date', 'id'], False),
+    ('ix_booking_paid_start_date', ['paid', 'start_date'], False),
+]
+
+
+def _plan_keys():
+    """(key, plan id) for every value booking.plan has held: ids and both label spellings."""
+    for plan in DEFAULT_PLANS:
+        period = PERIOD_LABELS[plan['period']]
+        yield plan['id'], plan['id']
+        for label in {f"{plan['name']} ₹{plan['price']}/{period}",
+                      f"{plan['name']} ₹{plan['price']:,}/{period}"}:
+            yield label, plan['id']
+
+
+def _parsed_start_date():
+    # The form always sent YYYY-MM-DD; anything else falls back to the booking day
+    start, created = booking.c.start_date, booking.c.created_at
+    dialect = op.get_context().dialect.name
+    if dialect == 'sqlite':
+        return sa.case(
+            (start.op('GLOB')('[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'), sa.func.substr(start, 1, 10)),
+            else_=sa.func.date(sa.func.coalesce(created, sa.func.current_timestamp())),
+        )
+    if dialect == 'postgresql':
+        return sa.case(
+            (start.op('~')('^[0-9]{4}-[0-9]{2}-[0-9]{2}'), sa.cast(sa.func.substr(start, 1, 10), sa.Date)),
+            else_=sa.cast(sa.func.coalesce(created, sa.func.current_timestamp()), sa.Date),
+        )
+    return sa.cast(sa.func.substr(start, 1, 10), sa.Date)
+
+
+def _backfill(statement):
+    """Run an UPDATE on booking, in committed id-range batches when connected."""
+    if context.is_offline_mode():
+        op.execute(statement)
+        return
+    low, high = op.get_bind().execute(sa.select(sa.func.min(booking.c.id), sa.func.max(booking.c.id))).one()
+    if low is None:
+        return
+    with op.get_context().autocommit_block():
+        for start in range(low, high + 1, BACKFILL_BATCH):
+            op.execute(statement.where(booking.c.id.between(start, start + BACKFILL_BATCH - 1)))
+
+
+def _batch_booking():
+    # SQLite rebuilds the table; offline there is nothing to reflect it from
+    copy_from = legacy_booking if context.is_offline_mode() else None
+    return op.batch_alter_table('booking', copy_from=copy_from)
+
+
+def upgrade():
+    op.add_column('booking', sa.Column('start_on', sa.Date(), nullable=True))
+    op.add_column('booking', sa.Column('plan_id', sa.String(length=30), nullable=True))
+
+    _backfill(booking.update().values(
+        start_on=_parsed_start_date(),
+        plan_id=sa.case(*[(booking.c.plan == key, plan_id) for key, plan_id in _plan_keys()],
+                        else_=None),
+    ))
+
+    # The old dummy gateway client handed every booking the same order id;
+    # keep it on the first booking only so the unique index can be built and
+    # fail the rest, which have no order that could ever be paid
+    duplicates = (sa.select(sa.func.min(booking.c.id))
+                  .where(booking.c.razorpay_order_id.isnot(None))
+                  .group_by(booking.c.razorpay_order_id))
+    op.execute(booking.update()
+               .where(booking.c.razorpay_order_id.isnot(None), booking.c.id.not_in(duplicates))
+               .values(razorpay_order_id=None, status='failed'))
+
+    with _batch_booking() as batch_op:
+        batch_op.drop_column('plan')
+        batch_op.drop_column('start_date')
+        batch_op.alter_column('start_on', new_column_name='start_date',
+                              existing_type=sa.Date(), nullable=False)
+        batch_op.create_foreign_key('fk_booking_plan_id_plan', 'plan', ['plan_id'], ['id'])
+
+    # On PostgreSQL the indexes are built without blocking writes
+    with op.get_context().autocommit_block():
+        for name, columns, unique in BOOKING_INDEXES:
+            op.create_index(name, 'booking', columns, unique=unique, postgresql_concurrently=True)
+        op.create_index('ix_contact_Email', 'contact', ['Email'], postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_contact_Email', table_name='contact')
+    for name, _, _ in reversed(BOOKING_INDEXES):
+        op.drop_index(name, table_name='booking')
+
+    op.add_column('booking', sa.Column('plan', sa.String(length=50), nullable=True))
+    op.add_column('booking', sa.Column('start_text', sa.String(length=20), nullable=True))
+    typed = sa.table(
+        'booking',
+        sa.column('id', sa.Integer),
+        sa.column('plan', sa.String),
+        sa.column('plan_id', sa.String),
+        sa.column('start_date', sa.Date),
+        sa.column('start_text', sa.String),
+    )
+    labels = [(typed.c.plan_id == plan['id'],
+               f"{plan['name']} ₹{plan['price']:,}/{PERIOD_LABELS[plan['period']]}")
+              for plan in DEFAULT_PLANS]
+    op.execute(typed.update().values(
+        plan=sa.func.coalesce(sa.case(*labels, else_=typed.c.plan_id), ''),
+        start_text=sa.cast(typed.c.start_date, sa.String(20)),
+    ))
+
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_constraint('fk_booking_plan_id_plan', type_='foreignkey')
+        batch_op.drop_column('plan_id')
+        batch_op.drop_column('start_date')
+        batch_op.alter_column('plan', existing_type=sa.String(length=50), nullable=False)
+        batch_op.alter_column('start_text', new_column_name='start_date',
+                              existing_type=sa.String(length=20), nullable=False)
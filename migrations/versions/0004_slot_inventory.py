@@ -0,0 +1,81 @@
+"""Shifts, per-date seat inventory and the seats each booking holds
+
+Revision ID: 0004_slot_inventory
+Revises: 0003_typed_booking
+Create Date: 2026-10-18 11:00:00
+
+Existing bookings hold no seats (seat_held is false): they predate the
+inventory, and allocation only ever counts bookings made through it.
+"""
+from datetime import time
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_slot_inventory'
+down_revision = '0003_typed_booking'
+branch_labels = None
+depends_on = None
+
+# The shifts this revision seeded, kept here so later edits in the app can't rewrite history
+DEFAULT_SHIFTS = [
+    dict(id='morning', name='सुबह 6–10', starts_at=time(6), ends_at=time(10), sort_order=1),
+    dict(id='midday', name='दोपहर 10–2', starts_at=time(10), ends_at=time(14), sort_order=2),
+    dict(id='afternoon', name='दोपहर 2–6', starts_at=time(14), ends_at=time(18), sort_order=3),
+    dict(id='evening', name='शाम 6–10', starts_at=time(18), ends_at=time(22), sort_order=4),
+]
+DEFAULT_SEATS = 30
+
+plan = sa.table('plan', sa.column('id', sa.String), sa.column('full_day', sa.Boolean))
+
+
+def upgrade():
+    shift_table = op.create_table(
+        'shift',
+        sa.Column('id', sa.String(length=20), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('starts_at', sa.Time(), nullable=False),
+        sa.Column('ends_at', sa.Time(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=True),
+        sa.Column('sort_order', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.bulk_insert(shift_table, [{'capacity': DEFAULT_SEATS, 'active': True, **shift}
+                                 for shift in DEFAULT_SHIFTS])
+
+    op.create_table(
+        'slot_inventory',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('shift_id', sa.String(length=20), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=False),
+        sa.Column('booked', sa.Integer(), nullable=False),
+        sa.CheckConstraint('booked >= 0 AND booked <= capacity', name='ck_slot_inventory_booked'),
+        sa.ForeignKeyConstraint(['shift_id'], ['shift.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('date', 'shift_id', name='uq_slot_inventory_date_shift'),
+    )
+
+    op.add_column('plan', sa.Column('full_day', sa.Boolean(), nullable=True))
+    op.execute(plan.update().values(full_day=plan.c.id.in_(['gold_monthly', 'gold_annual'])))
+
+    op.add_column('booking', sa.Column('end_date', sa.Date(), nullable=True))
+    op.add_column('booking', sa.Column('shift_id', sa.String(length=20),
+                                       sa.ForeignKey('shift.id'), nullable=True),
+                  inline_references=True)  # SQLite can add a column with REFERENCES, not a constraint
+    op.add_column('booking', sa.Column('seat_held', sa.Boolean(), nullable=False,
+                                       server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_column('seat_held')
+        batch_op.drop_column('shift_id')
+        batch_op.drop_column('end_date')
+    with op.batch_alter_table('plan') as batch_op:
+        batch_op.drop_column('full_day')
+    op.drop_table('slot_inventory')
+    op.drop_table('shift')
@@ -0,0 +1,35 @@
+"""Audit log for admin bulk actions
+
+Revision ID: 0005_admin_audit
+Revises: 0004_slot_inventory
+Create Date: 2026-10-18 13:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_admin_audit'
+down_revision = '0004_slot_inventory'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'admin_audit',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('user_email', sa.String(length=150), nullable=True),
+        sa.Column('record_type', sa.String(length=20), nullable=False),
+        sa.Column('action', sa.String(length=20), nullable=False),
+        sa.Column('criteria', sa.Text(), nullable=True),
+        sa.Column('affected', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_admin_audit_created_at', 'admin_audit', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_admin_audit_created_at', table_name='admin_audit')
+    op.drop_table('admin_audit')
@@ -0,0 +1,39 @@
+"""Daily booking and revenue rollups, and when each booking was paid
+
+Revision ID: 0006_daily_rollup
+Revises: 0005_admin_audit
+Create Date: 2026-10-18 15:00:00
+
+The table starts empty: run `flask rebuild-rollups` once after upgrading.
+Bookings already paid keep paid_at NULL and are counted as paid on the day
+they were made.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_daily_rollup'
+down_revision = '0005_admin_audit'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('booking', sa.Column('paid_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'daily_rollup',
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('plan_id', sa.String(length=30), nullable=False),
+        sa.Column('bookings', sa.Integer(), nullable=False),
+        sa.Column('paid', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.BigInteger(), nullable=False),
+        sa.Column('active_members', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('date', 'plan_id'),
+    )
+
+
+def downgrade():
+    op.drop_table('daily_rollup')
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_column('paid_at')
@@ -0,0 +1,27 @@
+"""Record when the order worker claimed a booking
+
+Revision ID: 0007_booking_claimed_at
+Revises: 0006_daily_rollup
+Create Date: 2026-10-18 16:00:00
+
+Rows already in "processing" have no claim time and are handed back to
+pending by the worker on its next pass.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_booking_claimed_at'
+down_revision = '0006_daily_rollup'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('booking', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('booking') as batch_op:
+        batch_op.drop_column('claimed_at')
@@ -0,0 +1,37 @@
+"""Indexes for the admin email prefix search on lower(email)
+
+Revision ID: 0008_email_prefix_indexes
+Revises: 0007_booking_claimed_at
+Create Date: 2026-10-18 17:00:00
+
+The admin filters match ``lower(email) LIKE 'prefix%'``, which the plain
+email indexes can't serve. On PostgreSQL the expression indexes use
+varchar_pattern_ops so LIKE can use them under any collation.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_email_prefix_indexes'
+down_revision = '0007_booking_claimed_at'
+branch_labels = None
+depends_on = None
+
+EMAIL_INDEXES = [
+    ('ix_booking_email_lower', 'booking', 'lower(email)'),
+    ('ix_contact_email_lower', 'contact', 'lower("Email")'),
+]
+
+
+def upgrade():
+    ops = ' varchar_pattern_ops' if op.get_context().dialect.name == 'postgresql' else ''
+    # On PostgreSQL the indexes are built without blocking writes
+    with op.get_context().autocommit_block():
+        for name, table, expression in EMAIL_INDEXES:
+            op.create_index(name, table, [sa.text(expression + ops)], postgresql_concurrently=True)
+
+
+def downgrade():
+    for name, table, _ in reversed(EMAIL_INDEXES):
+        op.drop_index(name, table_name=table)
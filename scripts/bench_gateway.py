@@ -0,0 +1,92 @@
+"""Compare gateway order-creation latency with and without the pooled session.
+
+Starts the fake gateway over TLS (self-signed cert made with openssl) and
+creates orders through razorpay.Client in two modes:
+
+  fresh   a new requests.Session per call (TCP + TLS handshake every time)
+  pooled  the shared keep-alive session from app.razorpay_client
+
+    python scripts/bench_gateway.py --calls 500 --threads 4
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import razorpay
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.razorpay_client import build_gateway_session  # noqa: E402
+from fake_gateway import FakeGateway, serve  # noqa: E402
+
+
+def make_cert(directory):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                    "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=127.0.0.1",
+                    "-addext", "subjectAltName=IP:127.0.0.1"],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(mode, base_url, cert, calls, threads):
+    shared = build_gateway_session(threads) if mode == "pooled" else None
+
+    def one_call(i):
+        session = shared or requests.Session()
+        client = razorpay.Client(session=session, auth=("rzp_test", "secret"), base_url=base_url)
+        if cert:
+            client.cert_path = cert
+        start = time.perf_counter()
+        client.order.create({"amount": 40000, "currency": "INR", "receipt": f"bench_{i}"},
+                            timeout=(3.05, 5))
+        elapsed = time.perf_counter() - start
+        if shared is None:
+            session.close()
+        return elapsed
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        samples = list(pool.map(one_call, range(calls)))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0, help="stub server-side delay (s)")
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cert = key = None
+        if not args.no_tls:
+            cert, key = make_cert(tmp)
+        server, base_url = serve(FakeGateway(latency=args.latency), certfile=cert, keyfile=key)
+
+        print(f"{args.calls} order creations, {args.threads} threads, {base_url}")
+        print(f"{'mode':<8}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+        for mode in ("fresh", "pooled"):
+            run(mode, base_url, cert, min(20, args.calls), args.threads)  # warm up
+            samples = [s * 1000 for s in run(mode, base_url, cert, args.calls, args.threads)]
+            print(f"{mode:<8}{percentile(samples, 50):>10.2f}{percentile(samples, 99):>10.2f}"
+                  f"{statistics.mean(samples):>10.2f}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
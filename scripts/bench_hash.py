@@ -0,0 +1,154 @@
+"""Pick PASSWORD_HASH_METHOD for this machine, then check logins can't starve bookings.
+
+Part 1 times generate/check for a range of werkzeug hash methods on one
+core and prints the cost of each; pick the strongest one whose check time
+is acceptable for a login (roughly 100-300 ms) and set PASSWORD_HASH_METHOD.
+
+Part 2 starts the app under gunicorn as deployed (gunicorn.conf.py,
+``--workers`` sync workers, one thread each) and fires a burst of
+wrong-password logins at /login from ``--threads`` client threads while
+another thread keeps requesting /api/availability. It runs once with
+PASSWORD_HASH_WORKERS as configured and once with one slot per worker
+(effectively uncapped), and reports the availability latency seen during
+each burst.
+
+    python scripts/bench_hash.py --rounds 5 --logins 60 --threads 16 --workers 4
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+METHODS = [
+    "pbkdf2:sha256:260000",
+    "pbkdf2:sha256:600000",
+    "pbkdf2:sha256:1000000",
+    "scrypt:16384:8:1",
+    "scrypt:32768:8:1",
+    "scrypt:65536:8:1",
+]
+
+
+def time_methods(methods, rounds):
+    print(f"{'method':<24}{'hash ms':>10}{'check ms':>10}")
+    for method in methods:
+        hashes, checks = [], []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            stored = generate_password_hash("correct horse battery staple", method)
+            hashed = time.perf_counter()
+            check_password_hash(stored, "correct horse battery staple")
+            hashes.append(hashed - started)
+            checks.append(time.perf_counter() - hashed)
+        print(f"{method:<24}{statistics.median(hashes) * 1000:>10.1f}{statistics.median(checks) * 1000:>10.1f}")
+
+
+def request(url, data=None, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data, headers or {}), timeout=60) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(env):
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+                              cwd=ROOT, env={**env, "PORT": str(port)},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            if request(f"{base}/livez") == 200:
+                return server, base
+        except OSError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start")
+
+
+def login_burst(base, logins, threads, label):
+    latencies = []
+    done = threading.Event()
+
+    def probe():
+        request(f"{base}/api/availability?days=1")
+        while not done.is_set():
+            started = time.perf_counter()
+            request(f"{base}/api/availability?days=1")
+            latencies.append(time.perf_counter() - started)
+            time.sleep(0.01)
+
+    def login(i):
+        # A fresh address (the first proxy hop is trusted) and account each time so the throttle never kicks in
+        data = urllib.parse.urlencode({"email": f"nobody{i}@example.com", "password": "wrong"}).encode()
+        return request(f"{base}/login", data, {"X-Forwarded-For": f"10.1.{i // 250}.{i % 250}"})
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        codes = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    latencies.sort()
+    print(f"{label:<12} logins {elapsed:6.2f} s ({codes.count(503)} busy)   "
+          f"availability p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms   "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.1f} ms   max {latencies[-1] * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--method", action="append", help="hash method to time (repeatable)")
+    parser.add_argument("--logins", type=int, default=60)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers (WEB_CONCURRENCY)")
+    args = parser.parse_args()
+
+    time_methods(args.method or METHODS, args.rounds)
+    print()
+
+    env = {**os.environ, "WEB_CONCURRENCY": str(args.workers), "GUNICORN_THREADS": "1",
+           "ORDER_QUEUE_MODE": "external", "RESPONSE_CACHE_TYPE": "null", "HEALTH_CHECK_GATEWAY": "0",
+           "PASSWORD_HASH_LOCK_DIR": tempfile.mkdtemp()}
+    if "DATABASE_URL" not in env:
+        env["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/hash.db"
+    subprocess.run([sys.executable, "-m", "flask", "--app", "wsgi", "db", "upgrade"], cwd=ROOT, env=env,
+                   check=True, capture_output=True)
+
+    capped = env.get("PASSWORD_HASH_WORKERS", "1")
+    for label, slots in ((f"capped ({capped})", capped), (f"uncapped ({args.workers})", str(args.workers))):
+        server, base = start_gunicorn({**env, "PASSWORD_HASH_WORKERS": slots})
+        try:
+            login_burst(base, args.logins, args.threads, label)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
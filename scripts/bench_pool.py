@@ -0,0 +1,84 @@
+"""Connection checkout latency under concurrent load, per database profile.
+
+Builds an engine with each profile's options from app.config (plus the same
+profile with pool_pre_ping on, which is what the app used to do) and has
+``--threads`` threads each check out a connection, run a short query and
+check it back in ``--checkouts`` times. Reports checkout latency
+percentiles, timeouts and throughput.
+
+Point DATABASE_URL at a scratch PostgreSQL database to get meaningful
+numbers (and a PgBouncer for the pgbouncer profile); the default is a
+throwaway SQLite file, where only the pool itself is exercised.
+
+    DATABASE_URL=postgresql://... python scripts/bench_pool.py --threads 16 --checkouts 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.config import database_engine_options  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(url, options, threads, checkouts, hold):
+    engine = create_engine(url, **options)
+    waits, timeouts = [], []
+
+    def worker(_):
+        for _ in range(checkouts):
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    waits.append(time.perf_counter() - started)
+                    conn.execute(text("SELECT 1"))
+                    time.sleep(hold)
+            except PoolTimeout:
+                timeouts.append(1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return waits, len(timeouts), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--checkouts", type=int, default=200)
+    parser.add_argument("--hold", type=float, default=0.002, help="seconds each connection is held")
+    parser.add_argument("--profile", action="append", help="profile to run (repeatable)")
+    args = parser.parse_args()
+
+    url = os.environ.get("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/pool.db"
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    profiles = args.profile or (["sqlite", "single", "gunicorn"] if url.startswith("sqlite")
+                                else ["single", "gunicorn", "pgbouncer"])
+    print(f"{args.threads} threads x {args.checkouts} checkouts against {url.split('@')[-1]}\n")
+    print(f"{'profile':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'timeouts':>10}{'checkouts/s':>13}")
+    for profile in profiles:
+        for pre_ping in (False, True):
+            options = dict(database_engine_options(profile), pool_pre_ping=pre_ping)
+            waits, timeouts, elapsed = run(url, options, args.threads, args.checkouts, args.hold)
+            label = profile + (" +pre_ping" if pre_ping else "")
+            print(f"{label:<22}{percentile(waits, 50) * 1000:>9.2f}{percentile(waits, 95) * 1000:>9.2f}"
+                  f"{percentile(waits, 99) * 1000:>9.2f}{max(waits) * 1000:>9.2f}{timeouts:>10}"
+                  f"{len(waits) / elapsed:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
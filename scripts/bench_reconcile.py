@@ -0,0 +1,71 @@
+"""Run the unpaid-booking reconciler against the fake gateway.
+
+Seeds a throwaway SQLite database with stale unpaid bookings (plus some
+that never got an order), runs reconcile_unpaid and prints its stats.
+
+    python scripts/bench_reconcile.py --bookings 2000 --concurrency 8 --rate 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_gateway import FakeGateway, serve  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bookings", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=100.0, help="gateway calls per second")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--paid-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    gateway = FakeGateway(latency=args.latency, paid_rate=args.paid_rate)
+    server, base_url = serve(gateway)
+    db_dir = tempfile.mkdtemp()
+    os.environ.update({
+        "KEY_ID": "rzp_test", "KEY_SECRET": "secret", "RAZORPAY_BASE_URL": base_url,
+        "DATABASE_URL": f"sqlite:///{db_dir}/reconcile.db",
+        "GATEWAY_POOL_SIZE": str(args.concurrency),
+    })
+
+    import logging
+    logging.disable(logging.INFO)
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations
+    from app.models import Booking, db
+    from app.reconcile import reconcile_unpaid
+
+    app = create_app()
+    with app.app_context():
+        init_migrations(app)
+        upgrade()
+        old = datetime.utcnow() - timedelta(days=3)
+        db.session.add_all(
+            Booking(name=f"stale {i}", email=f"stale{i}@example.com", phone="9999999999",
+                    plan_id="silver_monthly", start_date=date(2025, 1, 1), amount=40000,
+                    status="created" if i % 10 else "failed",
+                    razorpay_order_id=f"order_stale{i:08d}" if i % 10 else None,
+                    created_at=old)
+            for i in range(args.bookings))
+        db.session.commit()
+
+        stats = reconcile_unpaid(batch_size=args.batch_size, concurrency=args.concurrency,
+                                 rate=args.rate)
+        for key, value in stats.items():
+            print(f"{key:<18}{value}")
+        print(f"{'gateway requests':<18}{gateway.requests}")
+        print(f"{'still unpaid':<18}"
+              f"{Booking.query.filter(Booking.paid.isnot(True), Booking.status != 'expired').count()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Check the analytics rollups and time the dashboard against years of bookings.
+
+Seeds ``--years`` of bookings (``--per-day`` a day, a share of them paid,
+some legacy rows without a plan), rebuilds the rollups in bulk, then makes
+more bookings, payments and deletions through the incremental paths
+(record_booking, mark_paid, bulk delete) and checks that:
+
+  * the incrementally maintained rollups equal a fresh bulk rebuild
+  * a rebuild of just the last 30 days leaves the same rows
+
+Then times /admin/analytics over the last 30 days and over the whole span
+and compares it with the same figures aggregated from Booking directly.
+
+Uses a throwaway SQLite file unless DATABASE_URL is already set. Exits
+non-zero if any check fails.
+
+    python scripts/bench_rollups.py --years 3 --per-day 40
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def rollup_rows():
+    from app.models import DailyRollup, db
+
+    return {(r.date, r.plan_id): (r.bookings, r.paid, r.revenue, r.active_members)
+            for r in db.session.query(DailyRollup) if r.bookings or r.paid or r.revenue or r.active_members}
+
+
+def timed(fn, rounds=5):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--per-day", type=int, default=40)
+    parser.add_argument("--paid-share", type=float, default=0.7)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/rollups.db"
+    os.environ["ORDER_QUEUE_MODE"] = "external"
+    logging.disable(logging.WARNING)
+    from flask_migrate import upgrade
+    from sqlalchemy import func, insert
+    from app import create_app, init_migrations
+    from app.analytics import analytics_summary, mark_paid, rebuild_rollups, record_booking
+    from app.bulk import bulk_apply
+    from app.inventory import plan_end_date
+    from app.models import Booking, Plan, db
+
+    app = create_app()
+    failures = []
+    rng = random.Random(1)
+    with app.app_context():
+        init_migrations(app)
+        upgrade()
+        plans = [(p.id, p.period, p.price) for p in Plan.query.all()] + [(None, "month", 500)]
+
+        def booking(made, i):
+            plan_id, period, price = rng.choice(plans)
+            start = made.date() + timedelta(days=rng.randint(0, 10))
+            paid = rng.random() < args.paid_share
+            return {"name": f"member {i}", "email": f"m{i}@example.com", "phone": "9999999999",
+                    "plan_id": plan_id, "start_date": start, "end_date": plan_end_date(period, start),
+                    "amount": price * 100, "status": "created", "paid": paid, "created_at": made,
+                    "paid_at": made + timedelta(hours=rng.randint(0, 30)) if paid and rng.random() < 0.9 else None}
+
+        today = date.today()
+        first = today - timedelta(days=365 * args.years)
+        rows, i = [], 0
+        day = first
+        while day < today:
+            for _ in range(args.per_day):
+                rows.append(booking(datetime.combine(day, datetime.min.time()) + timedelta(minutes=rng.randint(0, 1439)), i))
+                i += 1
+            day += timedelta(days=1)
+        for chunk in range(0, len(rows), 5000):
+            db.session.execute(insert(Booking), rows[chunk:chunk + 5000])
+        db.session.commit()
+        print(f"seeded {len(rows)} bookings over {args.years} years")
+
+        started = time.perf_counter()
+        written = rebuild_rollups()
+        print(f"full rebuild: {written} rollup rows in {time.perf_counter() - started:.2f} s")
+
+        # Incremental paths: new bookings, payments, an admin bulk delete
+        for _ in range(50):
+            new = Booking(**booking(datetime.utcnow(), i))
+            new.paid, new.paid_at = False, None
+            i += 1
+            db.session.add(new)
+            db.session.flush()
+            record_booking(new)
+        db.session.commit()
+        unpaid = [b for (b,) in db.session.query(Booking.id).filter(Booking.paid.isnot(True)).limit(200)]
+        marked = mark_paid(Booking.id.in_(unpaid))
+        db.session.commit()
+        victims = [b for (b,) in db.session.query(Booking.id).order_by(func.random()).limit(100)]
+        deleted = bulk_apply("booking", "delete", [Booking.id.in_(victims)], {"ids": victims}, "bench")
+        print(f"incremental: 50 bookings, {marked} marked paid, {deleted} deleted")
+
+        incremental = rollup_rows()
+        rebuild_rollups(today - timedelta(days=29), today)
+        if rollup_rows() != incremental:
+            failures.append("a 30-day rebuild changed the rollups")
+        rebuild_rollups()
+        rebuilt = rollup_rows()
+        drift = {k for k in incremental.keys() | rebuilt.keys() if incremental.get(k) != rebuilt.get(k)}
+        if drift:
+            failures.append(f"incremental rollups differ from a rebuild on {len(drift)} rows, e.g. "
+                            f"{sorted(drift)[:3]}")
+
+        def from_bookings(start, end):
+            made = (db.session.query(func.count())
+                    .filter(Booking.created_at >= datetime.combine(start, datetime.min.time()),
+                            Booking.created_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+                    .scalar())
+            paid_at = func.coalesce(Booking.paid_at, Booking.created_at)
+            paid = (db.session.query(func.count(), func.sum(Booking.amount))
+                    .filter(Booking.paid.is_(True), paid_at >= datetime.combine(start, datetime.min.time()),
+                            paid_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+                    .one())
+            active = (db.session.query(func.count())
+                      .filter(Booking.paid.is_(True), Booking.start_date <= end, Booking.end_date >= end)
+                      .scalar())
+            return made, paid[0], paid[1] or 0, active
+
+        for label, start in (("last 30 days", today - timedelta(days=29)), ("whole span", first)):
+            summary = analytics_summary(start, today)
+            totals = summary["totals"]
+            expected = from_bookings(start, today)
+            got = (totals["bookings"], totals["paid"], totals["revenue"], totals["active_members"])
+            if got != expected:
+                failures.append(f"{label}: rollups say {got}, bookings say {expected}")
+            rollup_ms = timed(lambda: analytics_summary(start, today))
+            direct_ms = timed(lambda: from_bookings(start, today))
+            print(f"{label:<14} rollups {rollup_ms:8.2f} ms   from bookings {direct_ms:8.2f} ms")
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 1
+    page_ms = timed(lambda: client.get("/admin/analytics"))
+    status = client.get("/admin/analytics").status_code
+    print(f"/admin/analytics {status} in {page_ms:.2f} ms")
+    if status != 200:
+        failures.append(f"/admin/analytics answered {status}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Measure cold-start cost of the web app: import time and first-request latency.
+
+Every run starts a fresh interpreter, as a new gunicorn worker without
+--preload would, imports wsgi (which calls create_app) and then serves a
+first GET / and GET /plans through the test client. SQL statements run
+during import are counted too; there should be none.
+
+The same process then forks, as gunicorn --preload does, and times how long
+the forked worker takes to answer its first GET /plans.
+
+    python scripts/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def child():
+    import logging
+    logging.disable(logging.CRITICAL)
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    statements = []
+    event.listen(Engine, "before_cursor_execute", lambda *args: statements.append(1))
+
+    started = time.perf_counter()
+    import wsgi
+    imported = time.perf_counter()
+    import_statements = len(statements)
+
+    client = wsgi.app.test_client()
+    client.get("/")
+    first_request = time.perf_counter()
+    client.get("/plans")
+    first_db_request = time.perf_counter()
+
+    read_end, write_end = os.pipe()
+    forked = time.perf_counter()
+    if os.fork() == 0:
+        from app import reset_after_fork
+
+        reset_after_fork(wsgi.app)
+        wsgi.app.test_client().get("/plans?forked")
+        os.write(write_end, str(time.perf_counter() - forked).encode())
+        os._exit(0)
+    os.close(write_end)
+    forked_ready = float(os.read(read_end, 64))
+    os.wait()
+
+    print(json.dumps({
+        "import": imported - started,
+        "first request": first_request - imported,
+        "first db request": first_db_request - first_request,
+        "forked worker": forked_ready,
+        "sql at import": import_statements,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        sys.path.insert(0, ROOT)
+        return child()
+
+    db_dir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_dir}/startup.db", RESPONSE_CACHE_TYPE="null")
+    subprocess.run([sys.executable, "-m", "flask", "--app", "wsgi", "db", "upgrade"],
+                   cwd=ROOT, env=env, check=True, capture_output=True)
+
+    samples = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                             cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    for key in samples[0]:
+        values = [s[key] for s in samples]
+        if key.startswith("sql"):
+            print(f"{key:<18}{max(values)}")
+        else:
+            print(f"{key:<18}median {statistics.median(values) * 1000:7.1f} ms   "
+                  f"max {max(values) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Check that a login lockout survives anything done to the response cache.
+
+For each response cache backend ("lru" and "null") this fails enough logins
+for one account to be locked out, then churns the response cache (a few
+hundred anonymous /api/availability requests, a few thousand entries
+written straight into it, and a full clear) and checks that the next login
+attempt for the account is still refused with 429.
+
+Exits non-zero if any check fails.
+
+    python scripts/check_lockout.py
+"""
+import logging
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/lockout.db"
+    os.environ["ORDER_QUEUE_MODE"] = "external"
+    logging.disable(logging.WARNING)
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations
+    from app.cache import clear_page_cache, create_cache, get_cache
+
+    app = create_app()
+    with app.app_context():
+        init_migrations(app)
+        upgrade()
+
+    failures = []
+    attempts = app.config["LOGIN_FREE_ATTEMPTS"] + 3
+    for cache_type in ("lru", "null"):
+        app.config["RESPONSE_CACHE_TYPE"] = cache_type
+        app.extensions["response_cache"] = create_cache(app.config)
+        client = app.test_client()
+        email = f"victim-{cache_type}@example.com"
+
+        def login():
+            return client.post("/login", data={"email": email, "password": "wrong"}).status_code
+
+        codes = [login() for _ in range(attempts)]
+        locked = codes[-1] == 429
+        print(f"{'ok  ' if locked else 'FAIL'} {cache_type}: {attempts} bad logins end in {codes[-1]}")
+        if not locked:
+            failures.append(f"{cache_type}: no lockout")
+            continue
+
+        today = date.today()
+        for i in range(300):
+            client.get(f"/api/availability?from={today + timedelta(days=i % 30)}&days={1 + i % 14}")
+        with app.app_context():
+            cache = get_cache()
+            for i in range(app.config["RESPONSE_CACHE_SIZE"] * 10):
+                cache.set(f"churn:{i}", i)
+            clear_page_cache()
+
+        code = login()
+        ok = code == 429
+        print(f"{'ok  ' if ok else 'FAIL'} {cache_type}: after churning the cache the next login gets {code}")
+        if not ok:
+            failures.append(f"{cache_type}: lockout reset by cache churn")
+
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
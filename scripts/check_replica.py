@@ -0,0 +1,107 @@
+"""Check read-replica routing against two local SQLite files.
+
+Migrates a primary database, copies it as the "replica" and then adds one
+contact to each copy only, so every /admin page shows which database served
+it. Then checks, through the test client, that:
+
+1. /admin reads come from the replica;
+2. a bulk delete from the same visitor goes to the primary, and their next
+   /admin is read from the primary (read-your-writes);
+3. once READ_YOUR_WRITES_SECONDS have passed, /admin is back on the replica;
+4. with the replica unreachable, /admin falls back to the primary.
+
+Exits non-zero if any check fails.
+
+    python scripts/check_replica.py
+"""
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+def add_contact(path, name):
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO contact (Name, Email, Number, Message) VALUES (?, ?, '', '')",
+                     (name, f"{name}@example.com"))
+
+
+def contact_id(path, name):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT id FROM contact WHERE Name = ?", (name,)).fetchone()[0]
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    primary, replica = os.path.join(directory, "primary.db"), os.path.join(directory, "replica.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{primary}"
+    os.environ["REPLICA_DATABASE_URL"] = f"sqlite:///{replica}"
+    os.environ["READ_YOUR_WRITES_SECONDS"] = "1"
+    os.environ["RESPONSE_CACHE_TYPE"] = "null"
+    logging.disable(logging.WARNING)
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations
+    from app.models import db
+    from app.replica import READ_ROUTING, REPLICA_BIND
+
+    app = create_app()
+    with app.app_context():
+        init_migrations(app)
+        upgrade()
+        db.engines[REPLICA_BIND].dispose()
+    shutil.copy(primary, replica)
+    add_contact(primary, "only-on-primary")
+    add_contact(primary, "to-be-deleted")
+    add_contact(replica, "only-on-replica")
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = 1
+        sess["user_email"] = "admin@example.com"
+
+    failures = []
+
+    def admin_reads(expected, label):
+        body = client.get("/admin").get_data(as_text=True)
+        source = ("primary" if "only-on-primary" in body else
+                  "replica" if "only-on-replica" in body else "neither")
+        ok = source == expected
+        print(f"{'ok  ' if ok else 'FAIL'} {label}: /admin read from the {source}")
+        if not ok:
+            failures.append(label)
+
+    admin_reads("replica", "admin listing")
+
+    deleted = contact_id(primary, "to-be-deleted")
+    client.post("/admin/bulk/contact", json={"action": "delete", "ids": [deleted]})
+    with sqlite3.connect(primary) as conn:
+        written = conn.execute("SELECT COUNT(*) FROM contact WHERE id = ?", (deleted,)).fetchone()[0] == 0
+    print(f"{'ok  ' if written else 'FAIL'} bulk delete: applied to the primary")
+    if not written:
+        failures.append("bulk delete")
+    admin_reads("primary", "right after a write")
+
+    time.sleep(app.config["READ_YOUR_WRITES_SECONDS"] + 0.1)
+    admin_reads("replica", "after the read-your-writes window")
+
+    # Make the replica file impossible to open
+    with app.app_context():
+        db.engines[REPLICA_BIND].dispose()
+    os.remove(replica)
+    os.mkdir(replica)
+    admin_reads("primary", "replica unreachable")
+
+    print(f"\nrouting: {READ_ROUTING.state()}")
+    if failures:
+        print(f"{len(failures)} check(s) failed")
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
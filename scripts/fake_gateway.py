@@ -0,0 +1,143 @@
+"""A tiny local stand-in for the Razorpay orders API.
+
+Used by the benchmark and reconciliation scripts so they never touch the
+real gateway. Point the app at it with RAZORPAY_BASE_URL.
+
+    python scripts/fake_gateway.py --port 8765 --latency 0.02
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGateway:
+    def __init__(self, latency=0.0, failure_rate=0.0, paid_rate=0.5):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.paid_rate = paid_rate
+        self.orders = {}
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create_order(self, data):
+        with self._lock:
+            order_id = f"order_fake{next(self._ids):08d}"
+            order = {
+                "id": order_id,
+                "entity": "order",
+                "amount": data.get("amount"),
+                "currency": data.get("currency", "INR"),
+                "receipt": data.get("receipt"),
+                "status": "created",
+                "created_at": int(time.time()),
+            }
+            self.orders[order_id] = order
+            return order
+
+    def order(self, order_id):
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                # Orders created before the stub started: make up a stable outcome
+                paid = random.Random(order_id).random() < self.paid_rate
+                order = {"id": order_id, "entity": "order", "amount": 0,
+                         "status": "paid" if paid else "attempted"}
+                self.orders[order_id] = order
+            return order
+
+    def payments(self, order_id):
+        order = self.order(order_id)
+        items = []
+        if order["status"] == "paid":
+            items.append({"id": f"pay_{order_id[6:]}", "order_id": order_id,
+                          "status": "captured", "amount": order["amount"]})
+        return {"entity": "collection", "count": len(items), "items": items}
+
+
+def make_handler(gateway):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True
+        wbufsize = -1  # send headers and body in one write
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _simulate(self):
+            with gateway._lock:
+                gateway.requests += 1
+            if gateway.latency:
+                time.sleep(gateway.latency)
+            if random.random() < gateway.failure_rate:
+                self._send(500, {"error": {"code": "SERVER_ERROR", "description": "fake outage"}})
+                return False
+            return True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            data = json.loads(self.rfile.read(length) or b"{}")
+            if not self._simulate():
+                return
+            if self.path.rstrip("/") == "/v1/orders":
+                self._send(200, gateway.create_order(data))
+            else:
+                self._send(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "not found"}})
+
+        def do_GET(self):
+            if not self._simulate():
+                return
+            path = self.path.split("?")[0].rstrip("/")
+            match = re.fullmatch(r"/v1/orders/([^/]+)(/payments)?", path)
+            if match and match.group(2):
+                self._send(200, gateway.payments(match.group(1)))
+            elif match:
+                self._send(200, gateway.order(match.group(1)))
+            else:
+                self._send(404, {"error": {"code": "BAD_REQUEST_ERROR", "description": "not found"}})
+
+    return Handler
+
+
+def serve(gateway, host="127.0.0.1", port=0, certfile=None, keyfile=None):
+    """Start the stub in a daemon thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(gateway))
+    server.daemon_threads = True
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--paid-rate", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server, url = serve(FakeGateway(args.latency, args.failure_rate, args.paid_rate), port=args.port)
+    print(f"Fake gateway listening on {url} (set RAZORPAY_BASE_URL={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
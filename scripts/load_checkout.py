@@ -0,0 +1,103 @@
+"""Load test for the checkout write path: commits per checkout and throughput.
+
+Runs POST /payment_checkout through the Flask test client against a
+throwaway SQLite file and the local fake gateway, counting every COMMIT
+the engine issues until all gateway orders are settled.
+
+    python scripts/load_checkout.py --checkouts 500 --threads 8 --failure-rate 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_gateway import FakeGateway, serve  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checkouts", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="fraction of gateway calls answered with a 500")
+    args = parser.parse_args()
+
+    gateway = FakeGateway(latency=args.latency, failure_rate=args.failure_rate)
+    server, base_url = serve(gateway)
+    db_dir = tempfile.mkdtemp()
+    os.environ.update({
+        "KEY_ID": "rzp_test", "KEY_SECRET": "secret", "RAZORPAY_BASE_URL": base_url,
+        "DATABASE_URL": f"sqlite:///{db_dir}/load.db",
+        # Keep the breaker closed so every checkout reaches the gateway
+        "GATEWAY_FAILURE_THRESHOLD": "1000000", "GATEWAY_MAX_ATTEMPTS": "1",
+    })
+
+    import logging
+    logging.disable(logging.CRITICAL)
+    from flask_migrate import upgrade
+    from sqlalchemy import event
+    from app import create_app, init_migrations
+    from app.models import Booking, Shift, db
+
+    app = create_app()
+    with app.app_context():
+        init_migrations(app)
+        upgrade()
+        # Enough seats that no checkout is turned away
+        Shift.query.update({"capacity": args.checkouts})
+        db.session.commit()
+        engine = db.engine
+    start_date = (date.today() + timedelta(days=1)).isoformat()
+    commits = []
+    lock = threading.Lock()
+
+    @event.listens_for(engine, "commit")
+    def count_commit(conn):
+        # Background order threads are named "order-queue-N"
+        background = threading.current_thread().name.startswith("order-queue")
+        with lock:
+            commits.append(background)
+
+    def checkout(i):
+        client = app.test_client()
+        client.post("/payment_checkout", data={
+            "name": f"load {i}", "email": f"load{i}@example.com", "phone": "9999999999",
+            "plan": "silver_monthly", "shift": "morning", "start_date": start_date,
+            "idempotency_key": uuid.uuid4().hex,
+        })
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(checkout, range(args.checkouts)))
+    request_time = time.perf_counter() - start
+    order_queue = app.extensions.get("order_queue")
+    if order_queue is not None:
+        order_queue.join()
+    total_time = time.perf_counter() - start
+
+    with app.app_context():
+        rows = db.session.query(Booking).count()
+    request_commits = commits.count(False)
+
+    print(f"checkouts          {args.checkouts}")
+    print(f"booking rows left  {rows}")
+    print(f"gateway calls      {gateway.requests}")
+    print(f"commits            {len(commits)} ({request_commits} inside requests)")
+    print(f"commits/checkout   {len(commits) / args.checkouts:.2f} "
+          f"({request_commits / args.checkouts:.2f} inside requests)")
+    print(f"request phase      {args.checkouts / request_time:.1f} checkouts/s")
+    print(f"end to end         {args.checkouts / total_time:.1f} checkouts/s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
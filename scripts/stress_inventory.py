@@ -0,0 +1,117 @@
+"""Concurrency stress test for seat allocation: no shift may ever be overbooked.
+
+Fires many simultaneous POST /payment_checkout requests for the same start
+date against a shift with only a few seats, mixing single-shift and
+full-day plans, then checks the inventory against the bookings that won:
+
+  * no SlotInventory row has booked > capacity
+  * every row's booked count equals the bookings holding a seat in it
+  * no request failed with an error rather than a clean "sold out"
+
+Uses a throwaway SQLite file unless DATABASE_URL is already set (point it
+at a scratch PostgreSQL database to test row locking there). Exits non-zero
+if any check fails.
+
+    python scripts/stress_inventory.py --requests 300 --threads 16 --seats 10
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seats", type=int, default=10)
+    parser.add_argument("--full-day-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    if "DATABASE_URL" not in os.environ:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/stress.db"
+    # Orders are left for a worker that never runs; only allocation is under test
+    os.environ["ORDER_QUEUE_MODE"] = "external"
+
+    logging.disable(logging.WARNING)
+    # Unexpected failures (e.g. lock timeouts) are logged by the view; count them quietly
+    errors = ErrorCounter()
+    booking_log = logging.getLogger("app.routes.booking")
+    booking_log.propagate = False
+    booking_log.addHandler(errors)
+    from flask_migrate import upgrade
+    from app import create_app, init_migrations
+    from app.inventory import booking_shifts
+    from app.models import Booking, Plan, Shift, SlotInventory, db
+
+    app = create_app()
+    with app.app_context():
+        init_migrations(app)
+        upgrade()
+        Shift.query.update({"capacity": args.seats})
+        db.session.commit()
+
+    start = date.today() + timedelta(days=1)
+    local = threading.local()
+
+    def book(i):
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+        full_day = i < args.requests * args.full_day_share
+        response = local.client.post("/payment_checkout", data={
+            "name": f"stress {i}", "email": f"stress{i}@example.com", "phone": "9999999999",
+            "plan": "gold_monthly" if full_day else "silver_monthly", "shift": "morning",
+            "start_date": start.isoformat(), "idempotency_key": uuid.uuid4().hex,
+        })
+        return response.status_code == 200 and b"payment_status" in response.data
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(book, range(args.requests)))
+    elapsed = time.monotonic() - started
+
+    with app.app_context():
+        held = Counter()
+        for b in (db.session.query(Booking.start_date, Booking.end_date, Booking.shift_id, Plan.full_day)
+                  .join(Plan, Plan.id == Booking.plan_id)
+                  .filter(Booking.seat_held.is_(True))):
+            day = b.start_date
+            while day <= b.end_date:
+                for shift_id in booking_shifts(b.full_day, b.shift_id):
+                    held[(day, shift_id)] += 1
+                day += timedelta(days=1)
+        rows = SlotInventory.query.all()
+        overbooked = [r for r in rows if r.booked > r.capacity]
+        drifted = [r for r in rows if r.booked != held[(r.date, r.shift_id)]]
+        bookings = Booking.query.filter(Booking.seat_held.is_(True)).count()
+
+    print(f"requests           {len(results)}")
+    print(f"booked             {bookings} ({sum(results)} checkouts served)")
+    print(f"turned away        {len(results) - sum(results) - len(errors.records)}")
+    print(f"errors             {len(errors.records)}")
+    print(f"requests/s         {len(results) / elapsed:.1f}")
+    print(f"overbooked rows    {len(overbooked)}")
+    print(f"drifted rows       {len(drifted)}")
+    sys.exit(1 if overbooked or drifted or errors.records else 0)
+
+
+if __name__ == "__main__":
+    main()